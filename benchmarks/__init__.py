@@ -0,0 +1 @@
+"""Benchmarks and stress tests. Run each module from the repository root with python -m."""
@@ -0,0 +1,89 @@
+"""
+Measures the throughput of utils.async_database with many lookups in
+flight at once. Run from the repository root:
+
+    python -m benchmarks.bench_async --templates 10000 --concurrency 100 500
+
+Each run awaits a mix of get_templates, get_tags and search_templates
+calls with asyncio.gather, for several read thread counts, and compares
+them with the same calls made one after another.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from benchmarks.synthetic import generate_library
+from utils import database
+from utils.async_database import AsyncDatabase
+from utils.connection import close_connections
+
+CATEGORIES = ["Style", "Efficiency", "Links", "Other"]
+
+
+def get_lookups(count: int) -> list:
+    """Return (function name, arguments) pairs for the lookups to make."""
+    lookups = []
+    for number in range(count):
+        kind = number % 3
+        if kind == 0:
+            lookups.append(("get_templates", (CATEGORIES[number % 4], "code")))
+        elif kind == 1:
+            lookups.append(("get_tags", (number + 1,)))
+        else:
+            lookups.append(("search_templates", (["cache review"], None, 20)))
+    return lookups
+
+
+def run_sequential(db: str, lookups: list) -> float:
+    """Make the lookups one after another and return lookups per second."""
+    start = time.perf_counter()
+    for name, args in lookups:
+        getattr(database, name)(*args, database=db)
+    elapsed = time.perf_counter() - start
+    close_connections(db)
+    return len(lookups) / elapsed
+
+
+async def run_concurrent(db: str, lookups: list, read_threads: int) -> float:
+    """Make the lookups concurrently and return lookups per second."""
+    async with AsyncDatabase(db, read_threads) as async_db:
+        await async_db.get_categories()  # Open a connection before timing
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            getattr(async_db, name)(*args) for name, args in lookups
+            ))
+        elapsed = time.perf_counter() - start
+
+    return len(lookups) / elapsed
+
+
+def main():
+    """Parse the arguments and print the throughput of each configuration."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+        )
+    parser.add_argument("--templates", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = os.path.join(directory, "bench_async.sqlite3")
+        generate_library(db, args.templates, args.seed)
+
+        print(f"{args.templates} templates")
+        print(f"{'in flight':>10} {'mode':>14} {'lookups/s':>12}")
+        for count in args.concurrency:
+            lookups = get_lookups(count)
+            print(f"{count:10} {'sequential':>14} {run_sequential(db, lookups):12.0f}")
+            for threads in args.threads:
+                throughput = asyncio.run(run_concurrent(db, lookups, threads))
+                print(f"{count:10} {f'{threads} threads':>14} {throughput:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
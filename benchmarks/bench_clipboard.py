@@ -0,0 +1,149 @@
+"""
+Measures copy-to-paste latency of the clipboard backends in utils.copy
+and of copying a selection of templates the way the Copy button does.
+Run from the repository root:
+
+    python -m benchmarks.bench_clipboard --templates 10000 --selected 20
+
+Like bench_ui, a virtual X display is started with Xvfb when DISPLAY is
+not set. The Copy button is pressed in a TemplatePro window, and timed
+until its worker has delivered the texts and they are on the clipboard.
+The benchmark exits with status 1 if the median latency of the Tk
+clipboard or of the Copy button exceeds --limit-ms. Copying templates
+whose texts were not read yet is timed too, but not checked, as it
+waits for the worker.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from benchmarks.bench_ui import start_virtual_display
+from benchmarks.synthetic import generate_library
+from utils import copy as clipboard
+from utils.connection import close_connections
+from utils.store import template_store
+
+
+def time_round_trips(text: str, repeat: int) -> list:
+    """Copy the text and read it back, returning the timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        clipboard.copy(text)
+        pasted = clipboard.paste()
+        timings.append((time.perf_counter() - start) * 1000)
+        if pasted != text:
+            raise RuntimeError("The clipboard returned different text.")
+    return timings
+
+
+def wait_until_idle(root, app) -> None:
+    """Process events until the app's worker has delivered every result."""
+    while not app.worker.is_idle():
+        root.update()
+
+
+def time_copy_button(root, app, selected: int, repeat: int, kept: bool = True) -> list:
+    """
+    Check templates in the app, then press its Copy button and read the
+    clipboard once the texts are copied, returning the timings in
+    milliseconds. The texts are read when templates are checked; without
+    kept, they are dropped before copying, so that Copy reads them on the
+    worker thread, as when it is pressed right after checking.
+    """
+    template_ids = list(template_store.templates)
+    template_ids = template_ids[::max(len(template_ids) // selected, 1)][:selected]
+    timings = []
+    for _ in range(repeat):
+        clipboard.copy("")
+        for template_id in template_ids:
+            app.check_template(template_id, True)
+        wait_until_idle(root, app)
+        if not kept:
+            app.selection.forget_texts(template_ids)
+
+        start = time.perf_counter()
+        app.copy_checked()
+        wait_until_idle(root, app)
+        pasted = clipboard.paste()
+        timings.append((time.perf_counter() - start) * 1000)
+        if not pasted:
+            raise RuntimeError("Nothing was copied.")
+    return timings
+
+
+def summarize(name: str, timings: list) -> float:
+    """Print the median and maximum of timings and return the median."""
+    median = statistics.median(timings)
+    print(f"  {name:28} median {median:8.3f} ms   max {max(timings):8.3f} ms")
+    return median
+
+
+def main():
+    """Parse the arguments, run the measurements and check the limit."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+        )
+    parser.add_argument("--templates", type=int, default=10000)
+    parser.add_argument("--selected", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit-ms", type=float, default=10.0)
+    parser.add_argument("--pyperclip", action="store_true",
+                        help="also time pyperclip for comparison")
+    args = parser.parse_args()
+
+    display = start_virtual_display()
+    try:
+        import tkinter as tk  # Imported once the virtual display exists
+        root = tk.Tk()
+        root.withdraw()
+        text = "Template text " * 50
+
+        medians = []
+        if args.pyperclip:
+            print("pyperclip:")
+            summarize("copy + paste", time_round_trips(text, args.repeat))
+
+        clipboard.use_tk_clipboard(root)
+        print("Tk clipboard:")
+        medians.append(summarize("copy + paste", time_round_trips(text, args.repeat)))
+
+        from frames.frames_main import TemplatePro  # Needs the display too
+        print("Copy button:")
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "bench_clipboard.sqlite3")
+            generate_library(database, args.templates)
+            template_store.database = database
+            template_store.loaded = False
+            app = TemplatePro(root)
+            while not app.loaded:
+                root.update()
+
+            medians.append(summarize(
+                f"Copy {args.selected} checked + paste",
+                time_copy_button(root, app, args.selected, args.repeat)
+                ))
+            # Not checked against the limit: the worker may be busy
+            summarize(
+                f"Copy {args.selected} unread + paste",
+                time_copy_button(root, app, args.selected, args.repeat, kept=False)
+                )
+            app.worker.stop()
+            close_connections()
+
+        root.destroy()
+    finally:
+        if display:
+            display.terminate()
+
+    if max(medians) > args.limit_ms:
+        print(f"FAIL: median latency above {args.limit_ms} ms")
+        sys.exit(1)
+    print(f"OK: median latency below {args.limit_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Times the utils.database functions against synthetic libraries of
+several sizes and writes the results as JSON. Run from the repository
+root:
+
+    python -m benchmarks.bench_database --sizes 1000 10000 100000 --output bench.json
+
+Compare the JSON files written at two commits to see whether a change
+to the data layer made it faster or slower. The memory used by a loaded
+TemplateStore is recorded for each size too.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from itertools import count
+from benchmarks.synthetic import generate_library
+from utils import database
+from utils.connection import close_connections
+from utils.store import TemplateStore
+
+
+def time_calls(func, repeat: int) -> dict:
+    """Call a function repeatedly and return its timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "calls": repeat,
+        }
+
+
+def get_read_cases(db: str) -> dict:
+    """Return the read calls to time, keyed by name."""
+    filters = {
+        "none": {},
+        "category": {"category": "Style"},
+        "name": {"template_name": "code"},
+        "tags": {"tags": ["review", "cache"]},
+        "category+name": {"category": "Style", "template_name": "code"},
+        "category+tags": {"category": "Style", "tags": ["review", "cache"]},
+        "name+tags": {"template_name": "code", "tags": ["review"]},
+        }
+    cases = {
+        f"get_templates[{name}]": (
+            lambda kwargs=kwargs: database.get_templates(database=db, **kwargs)
+            )
+        for name, kwargs in filters.items()
+        }
+    cases.update({
+        "get_templates[none,no text]": (
+            lambda: database.get_templates(database=db, with_text=False)
+            ),
+        "get_template_texts[20]": (
+            lambda: database.get_template_texts(list(range(1, 401, 20)), db)
+            ),
+        "get_categories": lambda: database.get_categories(db),
+        "get_tags": lambda: database.get_tags(1, db),
+        "get_tags_for_templates[100]": (
+            lambda: database.get_tags_for_templates(list(range(1, 101)), db)
+            ),
+        "search_templates": lambda: database.search_templates(["code rev"], database=db),
+        "get_template_groups[none]": lambda: database.get_template_groups(None, db),
+        "get_template_groups[terms]": (
+            lambda: database.get_template_groups(["code", "cache"], db)
+            ),
+        })
+    return cases
+
+
+def get_store_cases(db: str) -> dict:
+    """Return the in-memory store calls to time, keyed by name."""
+    store = TemplateStore(db)
+    store.ensure_loaded()
+    common = sorted(
+        store.tag_index.tags, key=lambda tag: len(store.tag_index.tags[tag].ids), reverse=True
+        )[:3]
+    return {
+        "store.filter_templates[and]": lambda: store.filter_templates(common[:2]),
+        "store.filter_templates[or+not+category]": lambda: store.filter_templates(
+            any_tags=common[:2], no_tags=common[2:], category="Style"
+            ),
+        "store.tag_index.query[and]": lambda: store.tag_index.query(common[:2]),
+        "store.search_templates[typo]": lambda: store.search_templates(["refcator"]),
+        "store.search_templates[common]": lambda: store.search_templates(["code"]),
+        "store.search_templates[words]": lambda: store.search_templates(["vectr loop"]),
+        "store.get_template_groups[terms]": (
+            lambda: store.get_template_groups(["code", "cache"])
+            ),
+        }
+
+
+def run_write_cases(db: str, repeat: int) -> dict:
+    """Time creating, updating and deleting templates."""
+    template_ids = []
+    names = count()
+
+    def create():
+        template_ids.append(database.create_template(
+            f"Benchmark {next(names)}", "Benchmark text", "Style",
+            ["Benchmark", "Review"], db
+            ))
+
+    results = {"create_template": time_calls(create, repeat)}
+    updates = iter(template_ids)
+    results["update_template"] = time_calls(
+        lambda: database.update_template(
+            next(updates), "Other", "Updated", ["Updated"], "Updated text", db
+            ),
+        repeat
+        )
+    deletes = iter(template_ids)
+    results["delete_template"] = time_calls(
+        lambda: database.delete_template(next(deletes), db), repeat
+        )
+
+    # Tag and retag a tenth of the library in one call each. Every call
+    # gives the templates a new tag, except in the unchanged case, which
+    # only checks the full-text index.
+    bulk_ids = [row[0] for row in database.get_templates(database=db, with_text=False)]
+    bulk_ids = bulk_ids[:max(1, len(bulk_ids) // 10)]
+    bulk_repeat = max(1, repeat // 10)
+    tag_names = (f"Bulk {number}" for number in count())
+
+    def retag(*tags):
+        database.retag_templates({template_id: list(tags) for template_id in bulk_ids}, db)
+
+    results[f"tag_templates[{len(bulk_ids)}]"] = time_calls(
+        lambda: database.tag_templates(bulk_ids, [next(tag_names)], db), bulk_repeat
+        )
+    results[f"retag_templates[{len(bulk_ids)}]"] = time_calls(
+        lambda: retag("Review", next(tag_names)), bulk_repeat
+        )
+    retag("Review")
+    results[f"retag_templates[{len(bulk_ids)},unchanged]"] = time_calls(
+        lambda: retag("Review"), bulk_repeat
+        )
+    return results
+
+
+def get_commit() -> str:
+    """Return the current git commit, if any."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+            ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmarks(sizes: list, repeat: int, seed: int) -> dict:
+    """Generate a library of each size and time every case against it."""
+    results = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "seed": seed,
+        "sizes": {},
+        "memory": {},  # Bytes used by each part of a loaded store
+        }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            db = os.path.join(directory, f"bench_{size}.sqlite3")
+            start = time.perf_counter()
+            generate_library(db, size, seed)
+            print(f"{size} templates generated in {time.perf_counter() - start:.1f} s")
+
+            cases = {
+                name: time_calls(func, repeat)
+                for name, func in get_read_cases(db).items()
+                }
+            store = TemplateStore(db)
+            cases["store.load"] = time_calls(store.load, 1)
+            memory = store.memory_usage()
+            cases.update({
+                name: time_calls(func, repeat)
+                for name, func in get_store_cases(db).items()
+                })
+            cases.update(run_write_cases(db, repeat))
+            close_connections()
+
+            results["sizes"][str(size)] = cases
+            results["memory"][str(size)] = memory
+            for name, timing in cases.items():
+                print(f"  {name:32} {timing['median_ms']:10.3f} ms")
+            print(f"  {'store memory':32} {memory['total'] / 2 ** 20:10.1f} MB")
+
+    return results
+
+
+def main():
+    """Parse the arguments, run the benchmarks and write the results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+        )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_database.json")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeat, args.seed)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
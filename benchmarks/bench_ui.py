@@ -0,0 +1,149 @@
+"""
+Times building the TemplatePro widget tree against synthetic libraries
+of several sizes and writes the results as JSON. Run from the
+repository root:
+
+    python -m benchmarks.bench_ui --sizes 1000 10000 --output bench_ui.json
+
+When DISPLAY is not set, a virtual X display is started with Xvfb so
+that nothing appears on screen. For each size the benchmark reports the
+time to first paint of the main window, the time until its templates
+are shown, the time per search-driven rebuild, the time to open the
+update window with its list filled and the widget counts.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from benchmarks.bench_database import get_commit
+from benchmarks.synthetic import generate_library
+from data import config
+from utils.connection import close_connections
+from utils.store import template_store
+
+SEARCHES = ["code", "code, cache", "review", "zzz", "", "docs link"]
+
+
+def start_virtual_display(display: str = ":99"):
+    """Start Xvfb if there is no display and return its process."""
+    if os.environ.get("DISPLAY"):
+        return None
+    xvfb = shutil.which("Xvfb")
+    if not xvfb:
+        raise SystemExit("No DISPLAY is set and Xvfb was not found. Install "
+                         "Xvfb or run the benchmark under xvfb-run.")
+
+    process = subprocess.Popen(
+        [xvfb, display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    os.environ["DISPLAY"] = display
+    time.sleep(0.5)  # Give the server time to accept connections
+    return process
+
+
+def count_widgets(widget) -> int:
+    """Return the number of widgets below the given widget."""
+    return sum(1 + count_widgets(child) for child in widget.winfo_children())
+
+
+def wait_for_search(app, root) -> None:
+    """
+    Process events until the pending search has been queried on the
+    worker thread and its results are shown.
+    """
+    while app.search_job or not app.worker.is_idle():
+        root.update()
+    root.update()
+
+
+def benchmark_size(database: str, repeat: int) -> dict:
+    """Build the UI against a library and time it."""
+    # Imported here so that the virtual display exists first
+    import tkinter as tk
+    from frames.frames_main import TemplatePro
+    from frames.frames_bottom import open_new_window
+
+    template_store.database = database
+    template_store.loaded = False
+    config.SEARCH_DELAY_MS = 0  # Time the rebuild, not the debounce
+
+    start = time.perf_counter()
+    root = tk.Tk()
+    app = TemplatePro(root)
+    root.update()
+    first_paint = time.perf_counter() - start
+    while not app.loaded:
+        root.update()
+    loaded = time.perf_counter() - start
+    widgets = count_widgets(root)
+
+    rebuilds = []
+    for index in range(repeat):
+        start = time.perf_counter()
+        app.search_var.set(SEARCHES[index % len(SEARCHES)])
+        wait_for_search(app, root)
+        rebuilds.append((time.perf_counter() - start) * 1000)
+
+    # The editor lists its templates through the worker, like a search
+    start = time.perf_counter()
+    open_new_window(root, app)
+    root.update()
+    while not app.worker.is_idle():
+        root.update()
+    root.update()
+    update_window = time.perf_counter() - start
+    update_widgets = count_widgets(root) - widgets
+
+    root.destroy()
+    close_connections()
+
+    return {
+        "first_paint_ms": first_paint * 1000,
+        "loaded_ms": loaded * 1000,
+        "rebuild_median_ms": statistics.median(rebuilds),
+        "rebuild_max_ms": max(rebuilds),
+        "update_window_ms": update_window * 1000,
+        "main_window_widgets": widgets,
+        "update_window_widgets": update_widgets,
+        }
+
+
+def main():
+    """Parse the arguments, run the benchmarks and write the results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+        )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_ui.json")
+    args = parser.parse_args()
+
+    display = start_virtual_display()
+    results = {"commit": get_commit(), "seed": args.seed, "sizes": {}}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for size in args.sizes:
+                database = os.path.join(directory, f"bench_ui_{size}.sqlite3")
+                generate_library(database, size, args.seed)
+                results["sizes"][str(size)] = result = benchmark_size(database, args.repeat)
+                print(f"{size} templates:")
+                for name, value in result.items():
+                    print(f"  {name:24} {value:10.1f}")
+    finally:
+        if display:
+            display.terminate()
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
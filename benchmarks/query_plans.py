@@ -0,0 +1,284 @@
+"""
+Checks the query plans of every statement run by the utils.database
+functions against a synthetic library. Run from the repository root:
+
+    python -m benchmarks.query_plans --templates 10000
+
+Each case calls a database function while tracing the statements it
+runs, then runs EXPLAIN QUERY PLAN on each of them. A case fails if a
+required index is not used, or if a plan step scans a table or builds a
+temporary B-tree without being listed as expected for that case. The
+script exits with status 1 if any case fails or if a database function
+has no case, so a query change that falls back to full table scans is
+caught before it ships. Use --verbose to print every plan.
+"""
+
+import argparse
+import inspect
+import os
+import re
+import sys
+import tempfile
+from benchmarks.synthetic import generate_library
+from utils import database
+from utils.connection import close_connections, get_connection
+
+# Plan steps that are checked against the allowed patterns of a case
+CHECKED_STEP = re.compile(r"SCAN |USE TEMP B-TREE")
+
+# Table-valued functions over a JSON parameter, read row by row by design
+JSON_EACH = r"SCAN (json_each|p) VIRTUAL TABLE INDEX .*"
+# Full-text index lookups, by MATCH or by rowid
+FTS = r"SCAN (f|templates_fts|tags_fts) VIRTUAL TABLE INDEX .*"
+# Reading back the templates matched in either full-text index, grouped
+# by template to add up their scores, see database.fts_query
+FTS_MATCHES = [r"SCAN (s|m|f|\(subquery-\d+\))", "USE TEMP B-TREE FOR GROUP BY"]
+# Writes link tags through json_each and refresh the full-text index
+WRITE_STEPS = [JSON_EACH, FTS, "USE TEMP B-TREE FOR DISTINCT"]
+
+# Functions that build SQL or run inside another function's transaction
+NOT_CALLED_DIRECTLY = {"fts_query", "template_columns", "write_template_tags"}
+
+
+def get_cases(db: str) -> dict:
+    """
+    Return the cases to check, keyed by the function name followed by
+    the variant in brackets. Each case is (call, allowed, required):
+    the call runs the function, allowed lists patterns of the scan and
+    temporary B-tree steps that are expected, and required lists the
+    indexes that must appear in the plans. Writes come last.
+    """
+    return {
+        "get_categories": (
+            lambda: database.get_categories(db), ["SCAN category"], []
+            ),
+        "get_category_ids": (
+            lambda: database.get_category_ids(db), ["SCAN category"], []
+            ),
+        "get_quick_copy_buttons": (
+            lambda: database.get_quick_copy_buttons(db), ["SCAN quick_copy_buttons"], []
+            ),
+        "get_templates[none]": (
+            lambda: database.get_templates(database=db),
+            ["SCAN t"],  # Returns every template
+            ["sqlite_autoindex_template_tags_1"]
+            ),
+        "get_templates[category]": (
+            lambda: database.get_templates(category="Style", database=db),
+            [],
+            ["sqlite_autoindex_category_1", "idx_templates_category_id"]
+            ),
+        "get_templates[name]": (
+            lambda: database.get_templates(template_name="code", database=db),
+            ["SCAN t"],  # LIKE '%...%' cannot use an index
+            []
+            ),
+        "get_templates[tags]": (
+            lambda: database.get_templates(tags=["review", "cache"], database=db),
+            ["SCAN t"],  # LIKE '%...%' on tag names cannot use an index
+            ["sqlite_autoindex_template_tags_1"]
+            ),
+        "get_templates[category+name]": (
+            lambda: database.get_templates(
+                category="Style", template_name="code", database=db
+                ),
+            [],
+            ["idx_templates_category_id"]
+            ),
+        "get_templates[with_tags]": (
+            lambda: database.get_templates(category="Style", with_tags=True, database=db),
+            [],
+            ["idx_templates_category_id", "sqlite_autoindex_template_tags_1"]
+            ),
+        "get_templates[list]": (
+            lambda: database.get_templates(category="Style", with_text=False, database=db),
+            [],
+            ["idx_templates_category_id"]
+            ),
+        "get_templates_by_id": (
+            lambda: database.get_templates_by_id([1, 2, 3], db), [], []
+            ),
+        "get_template_texts": (
+            lambda: database.get_template_texts([1, 2, 3], db),
+            [JSON_EACH],
+            ["INTEGER PRIMARY KEY"]
+            ),
+        "search_templates": (
+            lambda: database.search_templates(
+                ["code rev"], category="Style", limit=10, database=db
+                ),
+            [FTS, *FTS_MATCHES, "USE TEMP B-TREE FOR ORDER BY"],  # Ranked by bm25
+            ["INTEGER PRIMARY KEY"]
+            ),
+        "get_template_groups[none]": (
+            lambda: database.get_template_groups(None, db),
+            ["SCAN c", "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY"],
+            ["idx_templates_category_id"]
+            ),
+        "get_template_groups[terms]": (
+            lambda: database.get_template_groups(["code"], db),
+            [FTS, *FTS_MATCHES, "SCAN c", "SCAN m LEFT-JOIN",
+             "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY"],
+            []
+            ),
+        "get_tags": (
+            lambda: database.get_tags(1, db),
+            [JSON_EACH, "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY"],
+            ["sqlite_autoindex_template_tags_1"]
+            ),
+        "get_tags_for_templates[all]": (
+            lambda: database.get_tags_for_templates(None, db),
+            [
+                # Every link is read, in template order, from the index
+                "SCAN tt USING COVERING INDEX sqlite_autoindex_template_tags_1",
+                "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY",
+                ],
+            []
+            ),
+        "get_tags_for_templates[ids]": (
+            lambda: database.get_tags_for_templates([1, 2], db),
+            [JSON_EACH, "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY"],
+            ["sqlite_autoindex_template_tags_1"]
+            ),
+        "create_template": (
+            lambda: database.create_template(
+                "Query plan", "Text", "Style", ["Plan", "Check"], db
+                ),
+            WRITE_STEPS,
+            ["sqlite_autoindex_category_1", "sqlite_autoindex_tags_1"]
+            ),
+        "tag_templates": (
+            lambda: database.tag_templates([1, 2], ["Plan"], db),
+            WRITE_STEPS,
+            ["sqlite_autoindex_tags_1"]
+            ),
+        "retag_templates": (
+            lambda: database.retag_templates({1: ["Check"]}, db),
+            WRITE_STEPS,
+            ["sqlite_autoindex_template_tags_1", "sqlite_autoindex_tags_1"]
+            ),
+        "update_template": (
+            lambda: database.update_template(2, "Links", "Renamed", ["Plan"], "Text", db),
+            WRITE_STEPS,
+            ["sqlite_autoindex_category_1", "sqlite_autoindex_template_tags_1"]
+            ),
+        "delete_template": (
+            lambda: database.delete_template(3, db),
+            [],
+            ["sqlite_autoindex_template_tags_1"]
+            ),
+        }
+
+
+def capture_statements(connection, call) -> list:
+    """
+    Run a call and return the distinct statements it ran, leaving out
+    transaction control, pragmas and the statements SQLite runs for
+    triggers and the full-text index internally.
+    """
+    statements = []
+    connection.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        connection.set_trace_callback(None)
+
+    distinct = []
+    for statement in statements:
+        keyword = statement.split(None, 1)[0].upper() if statement.strip() else ""
+        if (statement.startswith("--") or "'main'." in statement
+                or keyword in ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA")
+                or statement in distinct):
+            continue
+        distinct.append(statement)
+    return distinct
+
+
+def explain(connection, statement: str) -> list:
+    """Return the steps of a statement's query plan."""
+    return [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + statement)]
+
+
+def check_case(plans: list, allowed: list, required: list) -> list:
+    """Return the problems found in the plans of a case."""
+    problems = []
+    for statement, steps in plans:
+        for step in steps:
+            if CHECKED_STEP.match(step) and not any(
+                    re.fullmatch(pattern, step) for pattern in allowed):
+                problems.append(f"unexpected step '{step}' in: {' '.join(statement.split())[:120]}")
+
+    used = " ".join(step for _, steps in plans for step in steps)
+    for index in required:
+        if not re.search(rf"\b{re.escape(index)}\b", used):
+            problems.append(f"index {index} is not used")
+    return problems
+
+
+def get_uncovered(cases: dict) -> list:
+    """Return the database functions that have no case."""
+    functions = {
+        name for name, func in inspect.getmembers(database, inspect.isfunction)
+        if func.__module__ == database.__name__ and not name.startswith("_")
+        }
+    covered = {name.split("[")[0] for name in cases}
+    return sorted(functions - covered - NOT_CALLED_DIRECTLY)
+
+
+def run_checks(db: str, verbose: bool) -> int:
+    """Check every case against a database and return the number of failures."""
+    connection = get_connection(db)
+    cases = get_cases(db)
+    failures = 0
+
+    for name, (call, allowed, required) in cases.items():
+        plans = [
+            (statement, explain(connection, statement))
+            for statement in capture_statements(connection, call)
+            ]
+        problems = check_case(plans, allowed, required)
+        failures += bool(problems)
+        print(f"{'FAIL' if problems else 'ok  '} {name}")
+        for problem in problems:
+            print(f"       {problem}")
+        if verbose:
+            for statement, steps in plans:
+                print(f"       {' '.join(statement.split())[:120]}")
+                for step in steps:
+                    print(f"         {step}")
+
+    for name in get_uncovered(cases):
+        print(f"FAIL {name}: no query plan case")
+        failures += 1
+
+    return failures
+
+
+def main():
+    """Parse the arguments, generate a library and check the plans."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+        )
+    parser.add_argument("--templates", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = os.path.join(directory, "query_plans.sqlite3")
+        generate_library(db, args.templates, args.seed)
+        # Let the planner use statistics, as a long-used database would have
+        get_connection(db).execute("ANALYZE")
+        try:
+            failures = run_checks(db, args.verbose)
+        finally:
+            close_connections()
+
+    if failures:
+        print(f"{failures} query plan check(s) failed.")
+        sys.exit(1)
+    print("All query plans use the expected indexes.")
+
+
+if __name__ == "__main__":
+    main()
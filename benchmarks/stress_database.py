@@ -0,0 +1,97 @@
+"""
+Stress test with several processes reading and writing the same database
+at once. Run from the repository root:
+
+    python -m benchmarks.stress_database --readers 4 --writers 2 --seconds 5
+
+Each journal mode is tested against a fresh database. The reads and
+writes completed per second and the number of lock errors are reported.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from data import config
+from data.init_db import migrate
+from utils import database
+from utils.connection import close_connections
+
+
+def run_worker(database_path, journal_mode, seconds, writer, results):
+    """Read or write the database until the time is up."""
+    config.DB_JOURNAL_MODE = journal_mode
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+
+    while time.perf_counter() < deadline:
+        try:
+            if writer:
+                template_id = database.create_template(
+                    f"Stress {os.getpid()} {writes}", "Stress test", "Other",
+                    ["Stress", f"Process {os.getpid()}"], database_path
+                    )
+                database.update_template(
+                    template_id, new_template_text="Stress test updated",
+                    database=database_path
+                    )
+                writes += 2
+            else:
+                database.get_template_groups(["stress"], database_path)
+                database.get_templates("Other", database=database_path)
+                reads += 2
+        except sqlite3.OperationalError:
+            errors += 1
+
+    close_connections()
+    results.put((reads, writes, errors))
+
+
+def run_stress_test(journal_mode, readers, writers, seconds):
+    """Run the readers and writers against a fresh database."""
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "stress.sqlite3")
+        migrate(database_path)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(database_path, journal_mode, seconds, writer, results)
+                )
+            for writer in [False] * readers + [True] * writers
+            ]
+        for process in processes:
+            process.start()
+        totals = [sum(values) for values in zip(*(results.get() for _ in processes))]
+        for process in processes:
+            process.join()
+
+    reads, writes, errors = totals
+    return reads / seconds, writes / seconds, errors
+
+
+def main():
+    """Parse the arguments and print the results for each journal mode."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+        )
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--modes", nargs="+", default=["DELETE", "WAL"])
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g} s")
+    print(f"{'mode':8} {'reads/s':>10} {'writes/s':>10} {'errors':>8}")
+    for mode in args.modes:
+        reads, writes, errors = run_stress_test(
+            mode, args.readers, args.writers, args.seconds
+            )
+        print(f"{mode:8} {reads:10.1f} {writes:10.1f} {errors:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Generates reproducible synthetic template libraries. Run from the
+repository root to create one:
+
+    python -m benchmarks.synthetic data/synthetic.sqlite3 --templates 10000
+
+Categories and tags follow Zipf-like distributions, so a few of them are
+used by most templates, and template texts have a long tail of lengths.
+"""
+
+import argparse
+import itertools
+import os
+import random
+from typing import Dict, Iterator
+from data.init_db import migrate
+from utils.connection import close_connections
+from utils.database import get_category_ids
+from utils.transfer import write_batch
+
+WORDS = (
+    "code review style naming loop vector cache index query test docs link "
+    "error handle memory thread lock async import export format parse check "
+    "clean refactor module class function method return value type hint list "
+    "dict set tuple string number float integer boolean none default config "
+    "path file read write open close buffer stream batch bulk merge split join"
+    ).split()
+
+
+def zipf_weights(count: int, skew: float = 1.1) -> list:
+    """
+    Return the cumulative weights of a Zipf-like distribution over count
+    items, for zipf_choice. Build them once per list of items.
+    """
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def zipf_choice(rng: random.Random, items: list, cum_weights: list):
+    """Pick an item, favouring those near the start of the list."""
+    return rng.choices(items, cum_weights=cum_weights)[0]
+
+
+def generate_records(templates: int, seed: int = 0) -> Iterator[Dict]:
+    """Yield synthetic template records in the format used by utils.transfer."""
+    rng = random.Random(seed)
+    categories = [
+        "Completeness", "Efficiency", "Style", "Documentation", "Links",
+        "Other", "Unassigned"
+        ]
+    vocabulary = [
+        f"{rng.choice(WORDS)}-{number}" for number in range(max(templates // 20, 20))
+        ]
+    category_weights = zipf_weights(len(categories))
+    vocabulary_weights = zipf_weights(len(vocabulary))
+
+    for number in range(templates):
+        name_words = rng.sample(WORDS, rng.randint(2, 5))
+        text_length = min(int(rng.paretovariate(1.5) * 20), 2000)
+        yield {
+            "name": f"{' '.join(name_words)} {number}",
+            "text": " ".join(rng.choices(WORDS, k=text_length)),
+            "category": zipf_choice(rng, categories, category_weights),
+            "tags": list({
+                zipf_choice(rng, vocabulary, vocabulary_weights)
+                for _ in range(rng.randint(0, 6))
+                }),
+            }
+
+
+def generate_library(
+        database: str,
+        templates: int,
+        seed: int = 0,
+        batch_size: int = 5000
+    ) -> None:
+    """
+    Create a database filled with a synthetic library. An existing file
+    at the path is replaced.
+
+    Args:
+        database: The database file to create.
+        templates: The number of templates to generate.
+        seed: The random seed; the same seed gives the same library (optional).
+        batch_size: The number of templates per transaction (optional).
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database + suffix):
+            os.remove(database + suffix)
+    migrate(database)
+
+    category_ids = get_category_ids(database)
+    batch = []
+    for record in generate_records(templates, seed):
+        batch.append(record)
+        if len(batch) == batch_size:
+            write_batch(batch, category_ids, database)
+            batch = []
+    if batch:
+        write_batch(batch, category_ids, database)
+
+    close_connections()
+
+
+def main():
+    """Parse the arguments and generate a library."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+        )
+    parser.add_argument("database")
+    parser.add_argument("--templates", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_library(args.database, args.templates, args.seed)
+    print(f"Generated {args.templates} templates in {args.database}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,3 +9,36 @@ FRAME_RELIEF = "flat"
 PADDING = 5
 COLOR_1 = '#999793'
 COLOR_2 = '#636361'
+
+# Virtual list settings
+OVERSCAN_ROWS = 5  # Rows created above and below the visible viewport
+
+# Search settings
+SEARCH_DELAY_MS = 150  # Wait for typing to pause before running a search
+FUZZY_THRESHOLD = 0.4  # Share of a search word's trigrams a name or tags must contain
+FUZZY_TAG_WEIGHT = 0.8  # Weight of a trigram found in the tags but not the name
+TEXT_MATCH_SCORE = 0.3  # Score of a template matched only by words in its text
+TEXT_INDEX_BATCH_SIZE = 1000  # Template texts read at a time while indexing them for search
+
+# Database settings
+DB_CACHED_STATEMENTS = 128  # Compiled statements kept per connection
+DB_JOURNAL_MODE = "WAL"  # Lets readers run while another process writes
+DB_SYNCHRONOUS = "NORMAL"  # Safe with WAL; only the last commits may be lost on power loss
+DB_CACHE_SIZE = -16000  # Page cache per connection (negative values are in KiB)
+DB_MMAP_SIZE = 64 * 1024 * 1024  # Bytes of the database file to memory-map
+DB_BUSY_TIMEOUT_MS = 5000  # How long to wait for another connection's lock
+DB_WRITE_RETRIES = 5  # Attempts for a write transaction that finds the database locked
+DB_RETRY_DELAY = 0.05  # Seconds before the first retry, doubled after each attempt
+
+# Import settings
+IMPORT_BATCH_SIZE = 5000  # Templates written per transaction
+
+# Background worker settings
+WORKER_POLL_MS = 10  # How often Tk checks for finished database calls
+
+# Async data access settings
+ASYNC_READ_THREADS = 4  # Threads running concurrent reads for utils.async_database
+
+# Instrumentation settings
+INSTRUMENTATION = False  # Record call statistics from startup (can be toggled in the debug window)
+STATS_REFRESH_MS = 1000  # How often the debug window shows the latest statistics
@@ -1,93 +1,283 @@
 import sqlite3
-import sys
 
-def init_db(database: str = "data/db.sqlite3"):
-    """Initialize the database."""
-
-    sql_script = '''
-    /* Table for categories */
-    CREATE TABLE IF NOT EXISTS category (
-        category_id INTEGER PRIMARY KEY,
-        category_name VARCHAR(20) UNIQUE NOT NULL
-    );
-
-    /* Table for templates */
-    CREATE TABLE IF NOT EXISTS templates (
-        template_id INTEGER PRIMARY KEY,
-        template_name VARCHAR(20) NOT NULL,
-        template_text TEXT NOT NULL,
-        category_id INT, -- Foreign key to category table
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (category_id) REFERENCES category (category_id) 
-        ON DELETE SET NULL -- Temporarily set to NULL on delete
-    );
-
-    /* Trigger to move templates to 'Unassigned' category if category is deleted */
-    CREATE TRIGGER IF NOT EXISTS move_templates_to_unassigned
-    AFTER UPDATE ON templates
-    FOR EACH ROW
-    WHEN NEW.category_id IS NULL
-    BEGIN
-        UPDATE templates 
-        SET category_id = (SELECT category_id FROM category WHERE category_name = 'Unassigned')
-        WHERE template_id = NEW.template_id;
-    END;
-
-    /* Table for tags */
-    CREATE TABLE IF NOT EXISTS tags (
-        tag_id INTEGER PRIMARY KEY,
-        tag_name VARCHAR(255) UNIQUE NOT NULL
-    );
-
-    /* Table to associate templates with tags (many-to-many relationship) */
-    CREATE TABLE IF NOT EXISTS template_tags (
-        template_id INT NOT NULL,
-        tag_id INT NOT NULL,
-        PRIMARY KEY (template_id, tag_id), -- Composite key
-        FOREIGN KEY (template_id) REFERENCES templates (template_id) ON DELETE CASCADE,
-        FOREIGN KEY (tag_id) REFERENCES tags (tag_id) ON DELETE CASCADE
-    );
-
-    /* Table for quick copy buttons */
-    CREATE TABLE IF NOT EXISTS quick_copy_buttons (
-        button_id INTEGER PRIMARY KEY,
-        button_icon VARCHAR(1) NOT NULL,
-        button_text VARCHAR(20) NOT NULL
-    );
-
-    /* Insert dummy data into category table */
-    INSERT OR IGNORE INTO category (category_name) VALUES
-        ('Unassigned'),
-        ('Completeness'),
-        ('Efficiency'),
-        ('Style'),
-        ('Documentation'),
-        ('Links'),
-        ('Other');
-
-    /* Insert dummy data into quick_copy_buttons table */
-    INSERT OR IGNORE INTO quick_copy_buttons (button_icon, button_text) VALUES
-        ('Space', '‎ ‎ ‎ ‎ '),
-        ('❌', '❌ '),
-        ('●', '●'),
-        ('○', '○'),
-        ('▪', '▪'),
-        ('→', '→'),
-        ('✔️', '✔️ '),
-        ('⚠️', '⚠️'),
-        ('🔎', '🔎'),
-        ('📖', '📖'),
-        ('🔗', '🔗'),
-        ('💡', '💡'),
-        ('⬆️', '⬆️');
+# Schema migrations, applied in order. The number of migrations applied to
+# a database is stored in its user_version pragma, so a released migration
+# must never be edited; add a new one instead. Every statement must also be
+# safe to run on databases created before migrations existed.
+MIGRATIONS = [
+    # 1: Tables and default data
+    '''
+        /* Table for categories */
+        CREATE TABLE IF NOT EXISTS category (
+            category_id INTEGER PRIMARY KEY,
+            category_name VARCHAR(20) UNIQUE NOT NULL
+        );
+
+        /* Table for templates */
+        CREATE TABLE IF NOT EXISTS templates (
+            template_id INTEGER PRIMARY KEY,
+            template_name VARCHAR(20) NOT NULL,
+            template_text TEXT NOT NULL,
+            category_id INT, -- Foreign key to category table
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (category_id) REFERENCES category (category_id) 
+            ON DELETE SET NULL -- Temporarily set to NULL on delete
+        );
+
+        /* Trigger to move templates to 'Unassigned' category if category is deleted */
+        CREATE TRIGGER IF NOT EXISTS move_templates_to_unassigned
+        AFTER UPDATE ON templates
+        FOR EACH ROW
+        WHEN NEW.category_id IS NULL
+        BEGIN
+            UPDATE templates 
+            SET category_id = (SELECT category_id FROM category WHERE category_name = 'Unassigned')
+            WHERE template_id = NEW.template_id;
+        END;
+
+        /* Table for tags */
+        CREATE TABLE IF NOT EXISTS tags (
+            tag_id INTEGER PRIMARY KEY,
+            tag_name VARCHAR(255) UNIQUE NOT NULL
+        );
+
+        /* Table to associate templates with tags (many-to-many relationship) */
+        CREATE TABLE IF NOT EXISTS template_tags (
+            template_id INT NOT NULL,
+            tag_id INT NOT NULL,
+            PRIMARY KEY (template_id, tag_id), -- Composite key
+            FOREIGN KEY (template_id) REFERENCES templates (template_id) ON DELETE CASCADE,
+            FOREIGN KEY (tag_id) REFERENCES tags (tag_id) ON DELETE CASCADE
+        );
+
+        /* Table for quick copy buttons */
+        CREATE TABLE IF NOT EXISTS quick_copy_buttons (
+            button_id INTEGER PRIMARY KEY,
+            button_icon VARCHAR(1) NOT NULL,
+            button_text VARCHAR(20) NOT NULL
+        );
+
+        /* Insert dummy data into category table */
+        INSERT OR IGNORE INTO category (category_name) VALUES
+            ('Unassigned'),
+            ('Completeness'),
+            ('Efficiency'),
+            ('Style'),
+            ('Documentation'),
+            ('Links'),
+            ('Other');
+
+        /* Insert dummy data into quick_copy_buttons table (only once, as the
+           table has no unique key to ignore duplicates on) */
+        INSERT INTO quick_copy_buttons (button_icon, button_text)
+        SELECT column1, column2 FROM (VALUES
+            ('Space', '‎ ‎ ‎ ‎ '),
+            ('❌', '❌ '),
+            ('●', '●'),
+            ('○', '○'),
+            ('▪', '▪'),
+            ('→', '→'),
+            ('✔️', '✔️ '),
+            ('⚠️', '⚠️'),
+            ('🔎', '🔎'),
+            ('📖', '📖'),
+            ('🔗', '🔗'),
+            ('💡', '💡'),
+            ('⬆️', '⬆️')
+        )
+        WHERE NOT EXISTS (SELECT 1 FROM quick_copy_buttons);
+    ''',
+
+    # 2: Full-text index over template names, texts and tag names
+    '''
+        /* Full-text index over template names, texts and tag names */
+        CREATE VIRTUAL TABLE IF NOT EXISTS templates_fts USING fts5(
+            template_name,
+            template_text,
+            tag_names,
+            prefix = '2 3' -- Speed up short prefix searches
+        );
+
+        /* Triggers to keep the full-text index in sync with templates */
+        CREATE TRIGGER IF NOT EXISTS templates_fts_insert
+        AFTER INSERT ON templates
+        BEGIN
+            INSERT INTO templates_fts (rowid, template_name, template_text, tag_names)
+            VALUES (NEW.template_id, NEW.template_name, NEW.template_text, '');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS templates_fts_update
+        AFTER UPDATE OF template_name, template_text ON templates
+        BEGIN
+            UPDATE templates_fts
+            SET template_name = NEW.template_name, template_text = NEW.template_text
+            WHERE rowid = NEW.template_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS templates_fts_delete
+        AFTER DELETE ON templates
+        BEGIN
+            DELETE FROM templates_fts WHERE rowid = OLD.template_id;
+        END;
+
+        /* Tag names in the full-text index are refreshed once per write by
+           utils.database.write_template_tags rather than once per tag link.
+           Drop the per-link triggers of databases created before that. */
+        DROP TRIGGER IF EXISTS template_tags_fts_insert;
+        DROP TRIGGER IF EXISTS template_tags_fts_delete;
+
+        /* Index templates created before the full-text index existed */
+        INSERT INTO templates_fts (rowid, template_name, template_text, tag_names)
+        SELECT
+            t.template_id,
+            t.template_name,
+            t.template_text,
+            (
+                SELECT COALESCE(group_concat(tg.tag_name, ' '), '')
+                FROM template_tags tt
+                JOIN tags tg ON tt.tag_id = tg.tag_id
+                WHERE tt.template_id = t.template_id
+            )
+        FROM templates t
+        WHERE t.template_id NOT IN (SELECT rowid FROM templates_fts);
+    ''',
+
+    # 3: Indexes for the get_templates joins and ON DELETE CASCADE paths
+    '''
+        /* Filtering and grouping templates by category */
+        CREATE INDEX IF NOT EXISTS idx_templates_category_id
+        ON templates (category_id);
+
+        /* Joining tags to templates and cascading tag deletes. Lookups by
+           template use the primary key of template_tags. */
+        CREATE INDEX IF NOT EXISTS idx_template_tags_tag_id
+        ON template_tags (tag_id);
+
+        /* Looking up and sorting templates by name */
+        CREATE INDEX IF NOT EXISTS idx_templates_template_name
+        ON templates (template_name);
+    ''',
+
+    # 4: Bulk indexing of imported templates
     '''
+        /* While a transaction has a row in this table, the templates it
+           inserts are left for it to add to the full-text index in bulk */
+        CREATE TABLE IF NOT EXISTS templates_fts_deferred (
+            deferred INTEGER
+        );
 
-    # Connect to the SQLite database and execute the SQL script
+        DROP TRIGGER IF EXISTS templates_fts_insert;
+        CREATE TRIGGER templates_fts_insert
+        AFTER INSERT ON templates
+        WHEN NOT EXISTS (SELECT 1 FROM templates_fts_deferred)
+        BEGIN
+            INSERT INTO templates_fts (rowid, template_name, template_text, tag_names)
+            VALUES (NEW.template_id, NEW.template_name, NEW.template_text, '');
+        END;
+    ''',
+
+    # 5: Tag names in their own full-text index
+    '''
+        /* A change to a row of an FTS5 table re-indexes all of its columns,
+           so keeping tag names next to template texts made every retag
+           re-index the texts. Rebuild the index without them. */
+        DROP TRIGGER IF EXISTS templates_fts_insert;
+        DROP TRIGGER IF EXISTS templates_fts_update;
+        DROP TRIGGER IF EXISTS templates_fts_delete;
+        DROP TABLE IF EXISTS templates_fts;
+
+        /* Full-text index over template names and texts */
+        CREATE VIRTUAL TABLE templates_fts USING fts5(
+            template_name,
+            template_text,
+            prefix = '2 3' -- Speed up short prefix searches
+        );
+
+        /* Full-text index over the tag names of each template, refreshed by
+           utils.database.write_template_tags. Templates without tags have
+           no row. */
+        CREATE VIRTUAL TABLE IF NOT EXISTS tags_fts USING fts5(
+            tag_names,
+            prefix = '2 3'
+        );
+
+        /* Triggers to keep the full-text indexes in sync with templates */
+        CREATE TRIGGER templates_fts_insert
+        AFTER INSERT ON templates
+        WHEN NOT EXISTS (SELECT 1 FROM templates_fts_deferred)
+        BEGIN
+            INSERT INTO templates_fts (rowid, template_name, template_text)
+            VALUES (NEW.template_id, NEW.template_name, NEW.template_text);
+        END;
+
+        CREATE TRIGGER templates_fts_update
+        AFTER UPDATE OF template_name, template_text ON templates
+        BEGIN
+            UPDATE templates_fts
+            SET template_name = NEW.template_name, template_text = NEW.template_text
+            WHERE rowid = NEW.template_id;
+        END;
+
+        CREATE TRIGGER templates_fts_delete
+        AFTER DELETE ON templates
+        BEGIN
+            DELETE FROM templates_fts WHERE rowid = OLD.template_id;
+            DELETE FROM tags_fts WHERE rowid = OLD.template_id;
+        END;
+
+        /* Index the existing templates */
+        INSERT INTO templates_fts (rowid, template_name, template_text)
+        SELECT template_id, template_name, template_text
+        FROM templates;
+
+        DELETE FROM tags_fts;
+        INSERT INTO tags_fts (rowid, tag_names)
+        SELECT tt.template_id, group_concat(tg.tag_name, ' ')
+        FROM template_tags tt
+        JOIN tags tg ON tt.tag_id = tg.tag_id
+        GROUP BY tt.template_id;
+    ''',
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the number of migrations applied to the database."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(database: str = "data/db.sqlite3") -> int:
+    """
+    Apply the pending migrations to the database, each in its own
+    transaction, creating the database if it does not exist.
+
+    Args:
+        database: The database to migrate (optional).
+
+    Returns:
+        The number of migrations applied.
+    """
+    conn = sqlite3.connect(database)
+    try:
+        version = get_schema_version(conn)
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            try:
+                conn.executescript(
+                    f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;"
+                    )
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+    finally:
+        conn.close()
+
+    return len(MIGRATIONS) - min(version, len(MIGRATIONS))
+
+
+def init_db(database: str = "data/db.sqlite3"):
+    """Initialize the database, or upgrade an existing one."""
     try:
-        with sqlite3.connect(database) as conn:
-            cursor = conn.cursor()
-            cursor.executescript(sql_script)
-            conn.commit()
-            print("Database initialized successfully.")
+        applied = migrate(database)
+        print(f"Database initialized successfully ({applied} migrations applied).")
     except sqlite3.Error as e:
         print(f"An error occurred while initializing the database: {e}")
@@ -3,56 +3,113 @@
 import tkinter as tk
 from tkinter import ttk
 from frames.frames_bottom import open_new_window
-from utils import database
-from utils.widgets import (
-    highlight_row, add_scrollable_frame, bind_scroll_events, add_widgets
-)
-
-
-def widget_layout(canvas, instance, scrollable_frame, template, row_index):
-    """Create and add row widgets to scrollable frame."""
-    checked = tk.IntVar()
-    checkbutton = tk.Checkbutton(
-        scrollable_frame,
-        text=f"{template[1]}",
+from utils.instrumentation import instrumented
+from utils.store import template_store
+from utils.widgets import highlight_row, VirtualList
+
+
+def create_row(virtual_list, instance):
+    """Create an empty row widget for the virtual list."""
+    row = tk.Frame(virtual_list.canvas)
+    row.checked = tk.IntVar()
+    row.checkbutton = tk.Checkbutton(
+        row,
         anchor="w",
-        variable=checked,
+        variable=row.checked,
+        command=lambda: instance.check_template(row.item[0], row.checked.get()),
         )
-    checkbutton.checked = checked
-    checkbutton.associated_text = template[2]
-    button = tk.Button(
-        scrollable_frame, text="Edit", width=4,
-        command=lambda frame=canvas, instance=instance, default=template: open_new_window(frame, instance, default)
+    row.button = tk.Button(
+        row, text="Edit", width=4,
+        command=lambda: open_new_window(virtual_list.canvas, instance, row.item)
         )
 
     # Place widgets
-    checkbutton.grid(row=row_index, column=0, sticky="we")
-    button.grid(row=row_index, column=1, sticky="e")
+    row.checkbutton.grid(row=0, column=0, sticky="we")
+    row.button.grid(row=0, column=1, sticky="e")
 
     # Bind hover events for row highlight
-    highlight_row([checkbutton, button])
+    highlight_row([row.checkbutton, row.button])
+
+    # Ensure widgets take up the entire width of the row
+    row.grid_columnconfigure(0, weight=1)
+    row.grid_columnconfigure(1, weight=0)
+
+    return row
+
+
+def bind_row(instance, row, template):
+    """Show the given template in an existing row widget."""
+    row.checkbutton.configure(text=f"{template[1]}")
+    row.checked.set(int(template[0] in instance.selection))
+
+
+def tab_label(category, templates):
+    """Return the notebook tab label for a category."""
+    return f"({len(templates)}) {category[:4]}..."
+
+
+@instrumented
+def fill_tab(notebook, instance, index):
+    """
+    Create the rows of a tab the first time it is shown. The rows are
+    kept until the filter changes, and only refilled once the tab is
+    shown again.
+    """
+    tab_frame = notebook.nametowidget(notebook.tabs()[index])
+    if tab_frame.generation == notebook.generation:
+        return
+
+    # Make tab scrollable and only create widgets for visible rows.
+    if tab_frame.virtual_list is None:
+        tab_frame.virtual_list = VirtualList(
+            tab_frame,
+            lambda virtual_list: create_row(virtual_list, instance),
+            lambda _virtual_list, row, template, _row_index: bind_row(instance, row, template)
+            )
+    tab_frame.virtual_list.set_items(notebook.groups[index])
+    tab_frame.generation = notebook.generation
+
+
+def set_widgets(frame, _instance=None):
+    """
+    Show a placeholder until the templates have been loaded and
+    fill_widgets replaces it.
+    """
+    frame.grid_rowconfigure(0, weight=1)
+    frame.grid_columnconfigure(0, weight=1)
+    loading = ttk.Label(frame, text="Loading templates...", anchor="center")
+    loading.grid(row=0, column=0, sticky="nsew")
 
-    # Apply bindings to widgets
-    bind_scroll_events(checkbutton, canvas)
-    bind_scroll_events(button, canvas)
 
-    # Ensure widgets take up the entire width of scrollable frame
-    scrollable_frame.grid_columnconfigure(0, weight=1)
-    scrollable_frame.grid_columnconfigure(1, weight=0)
+def show_load_error(frame, error):
+    """Show why the templates could not be loaded in place of the placeholder."""
+    for widget in frame.winfo_children():
+        widget.destroy()  # The placeholder
+    message = ttk.Label(
+        frame, text=f"Could not load templates:\n{error}",
+        anchor="center", justify="center", wraplength=260
+        )
+    message.grid(row=0, column=0, sticky="nsew")
 
 
-def set_widgets(frame, instance=None, tags = None, tab_opened=0):
-    """Set up a scrollable frame and add widgets within the given frame."""
+@instrumented
+def fill_widgets(frame, instance, groups):
+    """Add a notebook with a tab for each group of templates to the frame."""
     
     def on_tab_change(event):
-        """Store selected tab in instance class when reloading widgets."""
+        """
+        Fill the selected tab and store it in instance class when
+        reloading widgets.
+        """
         notebook = event.widget
         selected_tab_id = notebook.select()
-        instance.default_tab = notebook.index(selected_tab_id)
+        fill_tab(notebook, instance, notebook.index(selected_tab_id))
+        if instance:
+            instance.default_tab = notebook.index(selected_tab_id)
 
     tab_opened=instance.default_tab
-    frame.grid_rowconfigure(0, weight=1)
-    frame.grid_columnconfigure(0, weight=1)
+    for widget in frame.winfo_children():
+        widget.destroy()  # The placeholder
 
     # Create a notebook to hold the tabs for each category
     # Set the style of the tabs
@@ -63,27 +120,82 @@ def set_widgets(frame, instance=None, tags = None, tab_opened=0):
         )
     notebook = ttk.Notebook(frame, style='TNotebook')
 
-    # Create and add tabs for each category in the database
-    categories = database.get_categories()
-    for _, category in enumerate(categories):
+    # Create an empty tab for each category in the database. The rows
+    # are only added when a tab is shown.
+    notebook.categories = list(groups)
+    notebook.groups = list(groups.values())
+    notebook.generation = 0
+    for category, templates in groups.items():
         tab_frame = ttk.Frame(notebook)
-        if tags:
-            name = tags[0] if len(tags) == 1 else None
-        else:
-            name = None
-        tab_label = (
-            f"({len(database.get_templates(category[0], name, tags))}) "
-            f"{category[0][:4]}..."
-            )
-        notebook.add(tab_frame, text=tab_label)
-
-        # Make tab scrollable and add widgets to tab.
-        canvas, scrollable_frame = add_scrollable_frame(tab_frame)
-        add_widgets(widget_layout, instance, canvas, scrollable_frame, category[0], name, tags)
+        tab_frame.virtual_list = None
+        tab_frame.generation = None
+        notebook.add(tab_frame, text=tab_label(category, templates))
 
     notebook.grid(row=0, column=0, sticky="nsew")
     notebook.select(tab_opened)
+    fill_tab(notebook, instance, tab_opened)
+
+    # Fill and store a selected tab in instance class
+    notebook.bind("<<NotebookTabChanged>>", on_tab_change)
+
+
+@instrumented
+def update_widgets(frame, instance, groups):
+    """
+    Show the templates of a new search, grouped by category, in the rows
+    of an existing notebook instead of recreating it. Only the selected
+    tab is refilled right away.
+    """
+    notebook = frame.winfo_children()[0]
+    notebook.groups = list(groups.values())
+    notebook.generation += 1
+    for index, (category, templates) in enumerate(groups.items()):
+        notebook.tab(index, text=tab_label(category, templates))
+    fill_tab(notebook, instance, notebook.index(notebook.select()))
+
+
+@instrumented
+def patch_widgets(frame, template_ids):
+    """
+    Show the current version of the given templates, which were created,
+    updated or deleted, without refilling the notebook. Only the tabs
+    holding them are touched; the selected tab keeps its scroll position
+    and the others are refilled when shown. The tabs must list templates
+    in ID order, as they do when no search is applied.
+    """
+    notebook = frame.winfo_children()[0]
+    changed = set(template_ids)
+    templates = template_store.get_templates_by_id(template_ids)
+    category_names = template_store.get_category_names()
+    selected = notebook.index(notebook.select())
+
+    for index, category in enumerate(notebook.categories):
+        items = notebook.groups[index]
+        kept = [template for template in items if template[0] not in changed]
+        added = [
+            template for template in templates.values()
+            if category_names.get(template[2]) == category
+            ]
+        if len(kept) == len(items) and not added:
+            continue
+
+        notebook.groups[index] = sorted(kept + added, key=lambda template: template[0])
+        notebook.tab(index, text=tab_label(category, notebook.groups[index]))
+
+        tab_frame = notebook.nametowidget(notebook.tabs()[index])
+        if tab_frame.virtual_list is None:
+            continue
+        if index == selected and tab_frame.generation == notebook.generation:
+            tab_frame.virtual_list.set_items(notebook.groups[index], keep_position=True)
+        else:
+            tab_frame.generation = None
+
 
-    # Detect and store a selected tab in instance class
-    if instance:
-        notebook.bind("<<NotebookTabChanged>>", on_tab_change)
+@instrumented
+def redraw_widgets(frame):
+    """Rebind the visible rows of every tab, e.g. after the selection changes."""
+    notebook = frame.winfo_children()[0]
+    for tab in notebook.tabs():
+        virtual_list = notebook.nametowidget(tab).virtual_list
+        if virtual_list is not None:
+            virtual_list.redraw()
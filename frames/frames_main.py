@@ -3,24 +3,43 @@
 import tkinter as tk
 from tkinter import ttk
 from frames import (
-    frames_top, frames_left, frames_body, frames_bottom
+    frames_top, frames_left, frames_body, frames_bottom, frames_stats
 )
 from data import config
-from utils.copy import copy
+from utils.copy import copy, use_tk_clipboard
+from utils.instrumentation import instrumented
+from utils.selection import Selection
+from utils.store import template_store
+from utils.worker import QueryWorker
 
 
 class TemplatePro():
     """Main application class for the Productivity App."""    
 
-    def __init__(self, root):
-        """Initialize the application."""
+    def __init__(self, root, on_loaded=None, on_load_error=None):
+        """
+        Initialize the application. The window is built empty and the
+        templates are filled in once loaded on the worker thread, after
+        which on_loaded is called if given. If loading fails, the error is
+        shown instead and passed to on_load_error if given.
+        """
         self.root = root
+        self.on_loaded = on_loaded
+        self.on_load_error = on_load_error
+        self.loaded = False
         self.default_tab = 0
+        self.selection = Selection()  # Checked template IDs, across tabs
+        self.worker = QueryWorker(root)
+        use_tk_clipboard(root)
+        template_store.add_listener(self.on_templates_changed)
         self.configure_root_window(root)
         self.configure_styles()
         self.create_frames(root)
         self.configure_grid(root)
 
+        # Hidden debug window with call statistics
+        root.bind("<Control-Shift-D>", lambda _event: frames_stats.open_stats_window(root))
+
     def configure_root_window(self, root):
         """Configure the main window."""
         root.title(config.WINDOW_TITLE)
@@ -51,7 +70,7 @@ class TemplatePro():
         )
 
         # Add left frame (Side button frame)
-        self.add_frame(
+        self.left_frame = self.add_frame(
             root, "frameLeft.TFrame", frames_left.set_widgets,
             row=1, col=0, rowspan=6, width=32, height=250
         )
@@ -65,31 +84,81 @@ class TemplatePro():
             row=8, col=0, colspan=3, width=400, height=32
         )
 
+        self.load_data()
+
+    def load_data(self):
+        """Read the library on the worker thread, then fill the frames."""
+        self.loaded = False
+        search_tags = self.search_tags
+        self.worker.submit(
+            lambda: (
+                template_store.get_quick_copy_buttons(),
+                template_store.get_template_groups(search_tags)
+                ),
+            callback=self.fill_frames,
+            error_callback=self.show_load_error,
+            key="load"  # A reload supersedes a load still running
+            )
+
+    @instrumented
+    def fill_frames(self, data):
+        """Add the quick copy buttons and the template tabs."""
+        button_data, groups = data
+        frames_left.add_buttons(self.left_frame, button_data)
+        frames_body.fill_widgets(self.body_frame, self, groups)
+        self.loaded = True
+        if self.on_loaded:
+            self.on_loaded()
+
+    def show_load_error(self, error):
+        """Show why the library could not be loaded in place of the templates."""
+        frames_body.show_load_error(self.body_frame, error)
+        if self.on_load_error:
+            self.on_load_error(error)
+
     def create_body_section(self, root):
         """Create the body section with search entry and buttons."""
 
         def on_text_change(*_args):
             """
-            Get the current text from the StringVar - NEEDS OPTIMIZATION!!!
+            Schedule a search once the user stops typing. Any search
+            still waiting to run is cancelled.
             """
+            if self.search_job:
+                root.after_cancel(self.search_job)
+            self.search_job = root.after(config.SEARCH_DELAY_MS, run_search)
+
+        def run_search(force=False):
+            """
+            Query the templates matching the search on the worker thread.
+            A newer search supersedes any query still running. The query
+            is skipped if the search did not change, unless forced.
+            """
+            self.search_job = None
             current_text = text_var.get()
 
             # Preprocess text into a list of tags.
             current_text = [
                 tag.strip() for tag in current_text.split(",")
                 ] if current_text else None
-            print(current_text)  # DEBUG PRINT
-
-            # Destroy each and recreate each widget in body frame
-            # (HIGH CPU UTILIZATION - OPTIMIZATION NEEDED)
-            for widget in body_frame.winfo_children():
-                widget.destroy()
-            frames_body.set_widgets(
-                body_frame, self, current_text, self.default_tab
+
+            # Skip the query if the filter did not change
+            if current_text == self.search_tags and not force:
+                return
+            self.search_tags = current_text
+
+            self.worker.submit(
+                template_store.get_template_groups, current_text,
+                callback=lambda groups: frames_body.update_widgets(body_frame, self, groups),
+                key="search"
                 )
 
+        self.search_job = None
+        self.search_tags = None
         text_var = tk.StringVar()
         text_var.trace_add("write", on_text_change)
+        self.search_var = text_var
+        self.run_search = run_search
         search_entry = ttk.Entry(root, style="entry.TEntry", text=text_var)
         search_entry.grid(
             row=1, column=1, columnspan=2,
@@ -101,38 +170,10 @@ class TemplatePro():
             root, "frameBody.TFrame", frames_body.set_widgets,
             row=2, col=1, rowspan=5, colspan=2, width=280
         )
-        
-        def copy_checked():
-            """
-            Copies all associated texts from the checked Checkboxes in
-            the selected tab to clipboard.
-            """
-            text_to_copy = ""
-
-            # Get the frame containing the checkboxes in the selected tab
-            notebook = body_frame.winfo_children()[0]
-            selected_tab = notebook.nametowidget(notebook.select())
-            canvas = selected_tab.winfo_children()[0]
-            scrollable_frame_id = canvas.find_all()[0]
-            scrollable_frame = canvas.nametowidget(canvas.itemcget(scrollable_frame_id, 'window'))
-
-            # Retrieve the associated text from all checked Checkboxes
-            associated_texts = []
-            for widget in scrollable_frame.winfo_children():
-                if isinstance(widget, tk.Checkbutton) and widget.checked.get():
-                    associated_text = getattr(widget, "associated_text", None)
-                    if associated_text:
-                        associated_texts.append(associated_text)
-                    widget.checked.set(0)
-
-            # Join all the associated texts with newline characters
-            text_to_copy = "\n".join(associated_texts)
-
-            copy(text_to_copy)
-
+        self.body_frame = body_frame
 
         copy_button = ttk.Button(
-            root, text="Copy", style="button.TButton", command=copy_checked
+            root, text="Copy", style="button.TButton", command=self.copy_checked
         )
         copy_button.grid(
             row=7, column=2,
@@ -140,6 +181,49 @@ class TemplatePro():
             sticky="e"
         )
 
+    def check_template(self, template_id, checked):
+        """
+        Check or uncheck a template. The text of a checked template is read
+        on the worker thread right away, so that copying it is immediate.
+        """
+        self.selection.set(template_id, checked)
+        if checked:
+            self.read_checked_texts([template_id])
+
+    def read_checked_texts(self, template_ids):
+        """Read the texts of checked templates on the worker thread and keep them."""
+        self.worker.submit(
+            template_store.get_texts, template_ids, callback=self.selection.add_texts
+            )
+
+    @instrumented
+    def copy_checked(self):
+        """
+        Copies the texts of the checked templates in every tab to the
+        clipboard, in the order they were checked. The texts were read
+        when the templates were checked; any not read yet are read in one
+        query on the worker thread first.
+        """
+        template_ids = list(self.selection)
+        texts = dict(self.selection.texts)
+        missing = self.selection.missing_texts()
+        self.selection.clear()
+        if self.loaded:
+            frames_body.redraw_widgets(self.body_frame)
+
+        def copy_texts(read_texts):
+            """Join the texts with newline characters and copy them."""
+            texts.update(read_texts)
+            copy("\n".join(
+                texts[template_id] for template_id in template_ids
+                if texts.get(template_id)
+                ))
+
+        if missing:
+            self.worker.submit(template_store.get_texts, missing, callback=copy_texts)
+        else:
+            copy_texts({})
+
     def add_frame(self, root, style, widget_func,
                   row, col, rowspan=1, colspan=1,
                   width=0, height=0):
@@ -174,21 +258,27 @@ class TemplatePro():
         root.grid_columnconfigure(0, minsize=32)
         root.grid_columnconfigure(1, weight=1)
 
-    def on_resize(self, event):
-        """Debug method to get the current window size."""
-        width = event.width
-        height = event.height
-        print(f"Window resized to: {width}x{height}")
-
-    def debug_widget(self, event):
-        """Debug method to get the widget being clicked."""
-        widget = event.widget  # Get the clicked widget
-        print(f"Clicked widget: {widget} of type {type(widget).__name__}")
-
-    def reload_window(self):
-        """Clear and repopulate the window's content."""
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    def on_templates_changed(self, created, updated, deleted):
+        """
+        Called by the template store after a write, possibly on the worker
+        thread. Show the changes once back on the main thread.
+        """
+        self.worker.call_soon(self.show_template_changes, created + updated + deleted, deleted)
 
-        # Recreate the frames and widgets
-        self.create_frames(self.root)
+    def show_template_changes(self, template_ids, deleted):
+        """
+        Patch the rows and tab counts of the changed templates. Search
+        results are ranked, so a search is run again instead. The kept
+        texts of changed templates that are checked are read again.
+        """
+        self.selection.discard(deleted)
+        changed = [template_id for template_id in template_ids if template_id in self.selection]
+        if changed:
+            self.selection.forget_texts(changed)
+            self.read_checked_texts(changed)
+        if not self.loaded or not self.body_frame.winfo_exists():
+            return
+        if self.search_tags:
+            self.run_search(force=True)
+        else:
+            frames_body.patch_widgets(self.body_frame, template_ids)
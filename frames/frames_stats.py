@@ -0,0 +1,78 @@
+"""Module for the hidden debug window showing instrumentation statistics."""
+
+import tkinter as tk
+from tkinter import ttk
+from tkinter import filedialog
+from data import config
+from utils.instrumentation import instrumentation
+
+COLUMNS = (
+    ("calls", "Calls", 60),
+    ("mean_ms", "Mean ms", 70),
+    ("p50_ms", "p50 ms", 60),
+    ("p95_ms", "p95 ms", 60),
+    ("max_ms", "Max ms", 70),
+    ("rows", "Rows", 70),
+    ("errors", "Errors", 50),
+)
+
+
+def open_stats_window(root):
+    """Open a window listing the statistics of every instrumented function."""
+
+    def refresh():
+        """Show the current statistics and schedule the next refresh."""
+        if not window.winfo_exists():
+            return
+        tree.delete(*tree.get_children())
+        stats = instrumentation.snapshot()
+        for name in sorted(stats, key=lambda name: -stats[name]["total_ms"]):
+            values = stats[name]
+            tree.insert("", tk.END, text=name, values=[
+                f"{values[key]:.2f}" if isinstance(values[key], float) else values[key]
+                for key, _, _ in COLUMNS
+                ])
+        window.after(config.STATS_REFRESH_MS, refresh)
+
+    def toggle():
+        """Switch recording on or off."""
+        instrumentation.enabled = bool(enabled.get())
+
+    def export():
+        """Save the statistics to a JSON file chosen by the user."""
+        path = filedialog.asksaveasfilename(
+            parent=window, defaultextension=".json",
+            initialfile="templatepro_stats.json",
+            filetypes=[("JSON", "*.json")]
+            )
+        if path:
+            instrumentation.export_json(path)
+
+    window = tk.Toplevel(root)
+    window.title("Statistics")
+    window.geometry(f"{config.DEFAULT_WIDTH * 2}x{config.DEFAULT_HEIGHT}")
+    window.wm_attributes('-topmost', 1)
+
+    tree = ttk.Treeview(window, columns=[key for key, _, _ in COLUMNS])
+    tree.heading("#0", text="Function")
+    tree.column("#0", width=280)
+    for key, heading, width in COLUMNS:
+        tree.heading(key, text=heading)
+        tree.column(key, width=width, anchor="e")
+    scrollbar = ttk.Scrollbar(window, orient="vertical", command=tree.yview)
+    tree.configure(yscrollcommand=scrollbar.set)
+
+    enabled = tk.IntVar(value=int(instrumentation.enabled))
+    buttons = ttk.Frame(window, padding=config.PADDING)
+    ttk.Checkbutton(buttons, text="Record", variable=enabled, command=toggle).pack(side="left")
+    ttk.Button(buttons, text="Reset", command=instrumentation.reset).pack(side="left")
+    ttk.Button(buttons, text="Export JSON", command=export).pack(side="right")
+
+    # Place widgets
+    tree.grid(row=0, column=0, sticky="nsew")
+    scrollbar.grid(row=0, column=1, sticky="ns")
+    buttons.grid(row=1, column=0, columnspan=2, sticky="ew")
+    window.grid_rowconfigure(0, weight=1)
+    window.grid_columnconfigure(0, weight=1)
+
+    refresh()
@@ -3,12 +3,13 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
-from utils import database
-from utils.widgets import (
-    highlight_row, add_scrollable_frame, bind_scroll_events, add_widgets
-)
+from data import config
+from utils.instrumentation import instrumented
+from utils.store import template_store
+from utils.widgets import highlight_row, VirtualList
 
 
+@instrumented
 def set_widgets(root, instance, new_window, default:int = None):
     """Set up and configure buttons in the given frame."""
 
@@ -26,9 +27,12 @@ def set_widgets(root, instance, new_window, default:int = None):
         tags = tk.Entry(frame_top)
         template_text = tk.Text(frame_top, height=5, wrap="word", undo=True, autoseparators=True)
 
+        def show_error(error):
+            messagebox.showerror("ERROR", f"{error}")
+
         def add_update_template():
             new_category = category.get()
-            if new_category in [c[0] for c in database.get_categories()]:
+            if new_category in [c[0] for c in template_store.get_categories()]:
                 new_name = name.get()
                 new_tags = [tag.strip() for tag in tags.get().split(",")]
                 new_template = template_text.get("1.0", tk.END).strip()
@@ -38,29 +42,41 @@ def set_widgets(root, instance, new_window, default:int = None):
                     new_name = name.get()
                     new_tags = [tag.strip() for tag in tags.get().split(",")]
                     new_template = template_text.get("1.0", tk.END).strip()
-                    database.update_template(
+                    instance.worker.submit(
+                        template_store.update_template,
                         add_template_button.template,
                         new_category,
                         new_name,
                         new_tags,
-                        new_template
+                        new_template,
+                        callback=on_template_updated,
+                        error_callback=show_error
                         )
-                    if default:
-                        close_new_window(root, new_window, instance)
                     return
 
                 # Create a new template
-                database.create_template(
+                instance.worker.submit(
+                    template_store.create_template,
                     new_name,
                     new_template,
                     new_category,
                     new_tags,
+                    callback=on_template_created,
+                    error_callback=show_error
                     )
-                cancel_template()
                 return
             
             messagebox.showerror("ERROR", "Category does not exist.")  
 
+        def on_template_created(_template_id):
+            # The window may have been closed while the write was running
+            if new_window.winfo_exists():
+                cancel_template()
+
+        def on_template_updated(_result):
+            if default and new_window.winfo_exists():
+                close_new_window(root, new_window, instance)
+
         def cancel_template():
             if default:
                 close_new_window(root, new_window, instance)
@@ -75,8 +91,14 @@ def set_widgets(root, instance, new_window, default:int = None):
         def delete_template():
             if add_template_button.template:
                 if messagebox.askokcancel("Warning", "Delete template?"):
-                    database.delete_template(add_template_button.template)
-                    messagebox.showinfo("Info", "Template has been deleted.")
+                    instance.worker.submit(
+                        template_store.delete_template,
+                        add_template_button.template,
+                        callback=lambda _result: messagebox.showinfo(
+                            "Info", "Template has been deleted."
+                            ),
+                        error_callback=show_error
+                        )
 
         add_template_button = tk.Button(frame_top, text="Insert", command=add_update_template)
         add_template_button.template = None  # For editing templates
@@ -107,52 +129,121 @@ def set_widgets(root, instance, new_window, default:int = None):
         return (category, name, tags, template_text, add_template_button)
 
     def configure_middle_frame(category, name, tags, template_text, add_template_button):
-        # Add all templates in the database
-
-        def widget_layout(canvas, _instance, scrollable_frame, template, row_index):
-            """Create and add row widgets to scrollable frame."""
-
-            def edit_template():
-                category.delete(0, tk.END)
-                category.insert(0, database.get_categories()[template[3] - 1])
-                name.delete(0, tk.END)
-                name.insert(0, template[1])
-                tags.delete(0, tk.END)
-                tags.insert(0, ", ".join(database.get_tags(template[0])))
-                template_text.delete(1.0, tk.END)
-                template_text.insert(tk.END, template[2])
-
-                add_template_button.template = template[0]
-                add_template_button.configure(text="Update")
-
-            # Create widgets
-            label = tk.Label(scrollable_frame, text=f"{row_index}. {template[1]}", anchor="w",)
-            label.associated_text = template[2]
+        # List the templates, only creating widgets for the visible rows
 
-            button = tk.Button(scrollable_frame, text="Edit", width=4, command=edit_template)
+        def edit_template(template):
+            """Show a template in the form so that it can be updated."""
+            category.delete(0, tk.END)
+            category.insert(0, template_store.get_category_names().get(template[2], ""))
+            name.delete(0, tk.END)
+            name.insert(0, template[1])
+            tags.delete(0, tk.END)
+            tags.insert(0, ", ".join(template_store.get_tags(template[0])))
+            template_text.delete(1.0, tk.END)
 
-            # Place widgets
-            label.grid(row=row_index, column=0, sticky="we")
-            button.grid(row=row_index, column=1, sticky="e")
+            add_template_button.template = template[0]
+            add_template_button.configure(text="Update")
 
-            # Bind hover events for row highlight
-            highlight_row([label, button])
+            # The list holds no texts, so read this one on the worker thread
+            instance.worker.submit(
+                template_store.get_texts, [template[0]],
+                callback=lambda texts: show_text(template[0], texts),
+                key="editor_text"
+                )
 
-            # Apply bindings to widgets
-            bind_scroll_events(label, canvas)
-            bind_scroll_events(button, canvas)
+        def show_text(template_id, texts):
+            """Show a template's text if it is still the one being edited."""
+            if (template_text.winfo_exists()
+                    and add_template_button.template == template_id):
+                template_text.delete(1.0, tk.END)
+                template_text.insert(tk.END, texts.get(template_id, ""))
 
-            # Ensure widgets take up the entire width of scrollable frame
-            scrollable_frame.grid_columnconfigure(0, weight=1)
-            scrollable_frame.grid_columnconfigure(1, weight=0)
+        def create_row(virtual_list):
+            """Create an empty row widget for the virtual list."""
+            row = tk.Frame(virtual_list.canvas)
+            row.label = tk.Label(row, anchor="w")
+            row.button = tk.Button(
+                row, text="Edit", width=4, command=lambda: edit_template(row.item)
+                )
 
-            # Display a default selected template on load
-            if default:
-                template = default
-                edit_template()
+            # Place widgets
+            row.label.grid(row=0, column=0, sticky="we")
+            row.button.grid(row=0, column=1, sticky="e")
 
-        canvas, scrollable_frame = add_scrollable_frame(frame_middle)
-        add_widgets(widget_layout, instance, canvas, scrollable_frame)
+            # Bind hover events for row highlight
+            highlight_row([row.label, row.button])
+
+            # Ensure widgets take up the entire width of the row
+            row.grid_columnconfigure(0, weight=1)
+            row.grid_columnconfigure(1, weight=0)
+
+            return row
+
+        def bind_row(_virtual_list, row, template, row_index):
+            """Show the given template in an existing row widget."""
+            row.label.configure(text=f"{row_index}. {template[1]}")
+
+        def on_search_change(*_args):
+            """Schedule a search once the user stops typing."""
+            nonlocal search_job
+            if search_job:
+                new_window.after_cancel(search_job)
+            search_job = new_window.after(config.SEARCH_DELAY_MS, run_search)
+
+        @instrumented(name="frames.frames_update.run_search")
+        def run_search(keep_position=False):
+            """List the templates matching the search, or all of them."""
+            nonlocal search_job
+            search_job = None
+            if not virtual_list.canvas.winfo_exists():
+                return
+            text = search_var.get().strip()
+            if text:
+                func, args = template_store.search_templates, ([text],)
+            else:
+                func, args = template_store.get_templates, ()
+            instance.worker.submit(
+                func, *args,
+                callback=lambda templates: show_templates(templates, keep_position),
+                key="editor_search"
+                )
+
+        @instrumented(name="frames.frames_update.show_templates")
+        def show_templates(templates, keep_position):
+            """Show the templates in the list if the window is still open."""
+            if virtual_list.canvas.winfo_exists():
+                virtual_list.set_items(templates, keep_position)
+
+        def on_templates_changed(_created, _updated, _deleted):
+            """List the current templates after a write, on the main thread."""
+            instance.worker.call_soon(run_search, True)
+
+        def on_destroy(event):
+            """Stop listening for writes once the window is closed."""
+            if event.widget is new_window:
+                template_store.remove_listener(on_templates_changed)
+
+        # Create a search box above the list
+        search_job = None
+        search_var = tk.StringVar()
+        search_var.trace_add("write", on_search_change)
+        search_entry = ttk.Entry(frame_middle, textvariable=search_var)
+        search_entry.grid(row=0, column=0, sticky="ew", pady=(0, config.PADDING))
+
+        list_frame = ttk.Frame(frame_middle)
+        list_frame.grid(row=1, column=0, sticky="nsew")
+        frame_middle.grid_rowconfigure(1, weight=1)
+        frame_middle.grid_columnconfigure(0, weight=1)
+
+        virtual_list = VirtualList(list_frame, create_row, bind_row)
+        run_search()  # Lists every template once the worker has read them
+
+        template_store.add_listener(on_templates_changed)
+        new_window.bind("<Destroy>", on_destroy, add="+")
+
+        # Display a default selected template on load
+        if default:
+            edit_template(default)
 
     def configure_bottom_frame():
 
@@ -197,4 +288,3 @@ def close_new_window(root, new_window, instance):
     root.geometry(f"{new_width}x{new_height}+{new_x}+{new_y}")
     new_window.destroy()  # Close the new window
     root.deiconify()  # Show the parent window again
-    instance.reload_window()
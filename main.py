@@ -1,29 +1,156 @@
 """Main entry point of the application"""
+import time
+START_TIME = time.perf_counter()  # Start of the startup profile
+
 import sys
 import os
+import sqlite3
 import tkinter as tk
-from data.init_db import init_db
-from frames.frames_main import TemplatePro
+from data.init_db import init_db, migrate
+from utils.connection import close_connections
+from utils.transfer import import_templates, export_templates
 
-# Set working directory
+# Set working directory, remembering where the app was launched from
+LAUNCH_DIR = os.getcwd()
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 DATABASE_PATH = "data/db.sqlite3"
 
+USAGE = """Usage:
+python main.py [--profile-startup]
+python main.py init_db
+python main.py import <file.jsonl|file.csv> [jsonl|csv]
+python main.py export <file.jsonl|file.csv> [jsonl|csv]"""
+
+
+def transfer(command, path, fmt=None):
+    """Import or export templates and report the rows per second."""
+
+    def report(count):
+        """Print the number of rows transferred so far."""
+        elapsed = time.perf_counter() - start
+        print(f"\r{count} rows in {elapsed:.1f} s "
+              f"({count / max(elapsed, 1e-9):.0f} rows/s)", end="", flush=True)
+
+    # Resolve the file relative to where the app was launched from
+    path = os.path.join(LAUNCH_DIR, path)
+
+    start = time.perf_counter()
+    try:
+        if command == "import":
+            migrate(DATABASE_PATH)
+            count = import_templates(path, fmt, progress=report, database=DATABASE_PATH)
+        else:
+            count = export_templates(path, fmt, database=DATABASE_PATH)
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print(f"\nAn error occurred during {command}: {e}")
+        sys.exit(1)
+    finally:
+        close_connections()
+
+    report(count)
+    print(f"\n{command.capitalize()} finished.")
+
+
+class StartupProfile():
+    """Records how long each phase of startup took."""
+
+    def __init__(self, start):
+        """Start timing from the given time.perf_counter() value."""
+        self.start = start
+        self.last = start
+        self.phases = []  # (phase, duration, time since start) in ms
+
+    def mark(self, phase):
+        """Record that a phase has just finished."""
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000, (now - self.start) * 1000))
+        self.last = now
+
+    def report(self):
+        """Return the phases as a table."""
+        lines = [f"{'Phase':36} {'Duration':>10} {'Elapsed':>10}"]
+        for phase, duration, elapsed in self.phases:
+            lines.append(f"{phase:36} {duration:8.1f}ms {elapsed:8.1f}ms")
+        return "\n".join(lines)
+
+
+def run_app(profile_startup=False):
+    """
+    Open the main window. With profile_startup, print how long each
+    phase took once the templates are shown, then quit. The profile exits
+    with status 1 if the templates could not be loaded.
+    """
+    profile = StartupProfile(START_TIME)
+    profile.mark("Import modules")
+
+    # Upgrade databases created by older versions
+    try:
+        migrate(DATABASE_PATH)
+    except sqlite3.Error as e:
+        print(f"An error occurred while upgrading the database: {e}")
+        sys.exit(1)
+    profile.mark("Upgrade database")
+
+    from frames.frames_main import TemplatePro  # Not needed by the CLI commands
+    from utils.store import template_store
+    template_store.database = DATABASE_PATH  # The database that was upgraded
+    profile.mark("Import UI modules")
+
+    def on_loaded():
+        """Finish the profile once the templates are shown."""
+        profile.mark("Load templates and fill tabs")
+        if profile_startup:
+            main_root.after_idle(finish_profile)
+
+    def finish_profile():
+        """Print the profile once the filled tabs are drawn, then quit."""
+        main_root.update_idletasks()
+        profile.mark("Interactive")
+        print(profile.report())
+        main_root.quit()
+
+    def on_load_error(error):
+        """Abort the profile if the templates could not be loaded."""
+        nonlocal load_failed
+        if profile_startup:
+            load_failed = True
+            profile.mark("Load templates (failed)")
+            print(profile.report())
+            print(f"An error occurred while loading the templates: {error}")
+            main_root.quit()
+
+    # Main loop
+    load_failed = False
+    main_root = tk.Tk()
+    profile.mark("Create Tk root")
+    app = TemplatePro(main_root, on_loaded=on_loaded, on_load_error=on_load_error)
+    profile.mark("Build window shell")
+    main_root.update()
+    profile.mark("First paint")
+    try:
+        main_root.mainloop()
+    finally:
+        app.worker.stop()
+        close_connections()
+    if load_failed:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] != '--profile-startup':
         # Create and initialize database.
         if sys.argv[1] == 'init_db':
             init_db()
+        # Stream templates from or to a file.
+        elif sys.argv[1] in ('import', 'export') and len(sys.argv) in (3, 4):
+            transfer(*sys.argv[1:])
         else:
-            print("Usage: python main.py init_db")
+            print(USAGE)
     else:
         # Check if the database file exists before running the main loop
         if os.path.exists(DATABASE_PATH):
-            # Main loop
-            main_root = tk.Tk()
-            app = TemplatePro(main_root)
-            main_root.mainloop()
+            run_app(profile_startup=len(sys.argv) > 1)
         else:
             print(f"Database file '{DATABASE_PATH}' does not exist. "
                   "Please initialize the database first by running:")
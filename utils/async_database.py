@@ -0,0 +1,148 @@
+"""
+asyncio façade over utils.database for services and scripts.
+
+Reads run concurrently on a pool of threads and writes run one at a time
+on a dedicated thread. Each thread keeps its own long-lived connection
+from utils.connection, so reads can proceed while a write is running
+(the database uses WAL mode).
+
+Example:
+
+    async with AsyncDatabase("data/db.sqlite3") as db:
+        templates = await db.get_templates(category="Style")
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional
+from data import config
+from utils import database as db
+from utils.connection import close_connections
+
+
+class AsyncDatabase():
+    """Async versions of the utils.database functions for one database."""
+
+    def __init__(self, database: str = "data\\db.sqlite3",
+                 read_threads: int = config.ASYNC_READ_THREADS):
+        """Create the read and write executors."""
+        self.database = database
+        self.thread_ids = set()  # Executor threads, whose connections close closes
+        self.read_executor = ThreadPoolExecutor(
+            max_workers=read_threads, thread_name_prefix="database-read",
+            initializer=self.add_thread
+            )
+        self.write_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="database-write",
+            initializer=self.add_thread
+            )
+
+    def add_thread(self) -> None:
+        """Remember an executor thread as it starts."""
+        self.thread_ids.add(threading.get_ident())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc_info):
+        await self.close()
+
+    async def run(self, executor, func, *args, **kwargs):
+        """Run a utils.database function on an executor and await it."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, database=self.database, **kwargs)
+        return await loop.run_in_executor(executor, call)
+
+    async def read(self, func, *args, **kwargs):
+        """Run a read concurrently with other reads."""
+        return await self.run(self.read_executor, func, *args, **kwargs)
+
+    async def write(self, func, *args, **kwargs):
+        """Run a write after the writes submitted before it."""
+        return await self.run(self.write_executor, func, *args, **kwargs)
+
+    async def get_categories(self) -> List[Tuple]:
+        """See database.get_categories."""
+        return await self.read(db.get_categories)
+
+    async def get_templates(
+            self,
+            category: Optional[str] = None,
+            template_name: Optional[str] = None,
+            tags: Optional[List[str]] = None,
+            with_tags: bool = False,
+            with_text: bool = True
+        ) -> List[Tuple]:
+        """See database.get_templates."""
+        return await self.read(
+            db.get_templates, category, template_name, tags,
+            with_tags=with_tags, with_text=with_text
+            )
+
+    async def get_template_texts(self, template_ids: List[int]) -> Dict[int, str]:
+        """See database.get_template_texts."""
+        return await self.read(db.get_template_texts, template_ids)
+
+    async def search_templates(
+            self,
+            terms: List[str],
+            category: Optional[str] = None,
+            limit: Optional[int] = None,
+            with_text: bool = True
+        ) -> List[Tuple]:
+        """See database.search_templates."""
+        return await self.read(
+            db.search_templates, terms, category, limit, with_text=with_text
+            )
+
+    async def get_tags(self, template_id: int) -> List[str]:
+        """See database.get_tags."""
+        return await self.read(db.get_tags, template_id)
+
+    async def get_tags_for_templates(
+            self,
+            template_ids: Optional[List[int]] = None
+        ) -> Dict[int, List[str]]:
+        """See database.get_tags_for_templates."""
+        return await self.read(db.get_tags_for_templates, template_ids)
+
+    async def create_template(
+            self,
+            name: str,
+            template_text: str,
+            category: Optional[str] = None,
+            tags: Optional[List[str]] = None
+        ) -> int:
+        """See database.create_template."""
+        return await self.write(db.create_template, name, template_text, category, tags)
+
+    async def update_template(
+            self,
+            template_id: int,
+            new_category: Optional[str] = None,
+            new_name: Optional[str] = None,
+            new_tags: Optional[List[str]] = None,
+            new_template_text: Optional[str] = None
+        ) -> None:
+        """See database.update_template."""
+        await self.write(
+            db.update_template, template_id, new_category, new_name,
+            new_tags, new_template_text
+            )
+
+    async def delete_template(self, template_id: int) -> None:
+        """See database.delete_template."""
+        await self.write(db.delete_template, template_id)
+
+    async def close(self) -> None:
+        """
+        Wait for pending calls, then stop the threads and close their
+        connections. Connections of other threads, e.g. the app's worker,
+        are left open.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.read_executor.shutdown)
+        await loop.run_in_executor(None, self.write_executor.shutdown)
+        close_connections(self.database, self.thread_ids)
@@ -0,0 +1,107 @@
+"""
+Keeps long-lived connections to the database so that connection setup,
+schema parsing and statement compilation are paid once.
+"""
+
+import functools
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+from data import config
+
+# One connection per database path and thread
+_connections = {}
+_lock = threading.Lock()
+
+
+def configure_connection(conn: sqlite3.Connection) -> None:
+    """Apply the pragmas from data/config.py to a new connection."""
+    conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA journal_mode = {config.DB_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous = {config.DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {int(config.DB_CACHE_SIZE)}")
+    conn.execute(f"PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}")
+
+
+def get_connection(database: str) -> sqlite3.Connection:
+    """
+    Returns the open connection to the database for the calling thread,
+    connecting on first use. Worker threads each get their own
+    connection, so a small pool forms when calls come from several
+    threads.
+
+    Args:
+        database: The database to connect to.
+
+    Returns:
+        The connection. It must not be closed by the caller; use it as a
+        context manager to commit or roll back a transaction.
+    """
+    key = (database, threading.get_ident())
+    conn = _connections.get(key)
+    if conn is None:
+        conn = sqlite3.connect(
+            database,
+            timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+            cached_statements=config.DB_CACHED_STATEMENTS,
+            check_same_thread=False,  # Only ever used by the thread in its key
+        )
+        configure_connection(conn)
+        with _lock:
+            _connections[key] = conn
+
+    return conn
+
+
+def close_connections(
+        database: Optional[str] = None,
+        thread_ids: Optional[Iterable[int]] = None
+    ) -> None:
+    """
+    Closes every open connection, or only those to one database or
+    opened by some threads. Call this when the app shuts down.
+
+    Args:
+        database: The database whose connections to close (optional).
+        thread_ids: The threading.get_ident() values of the threads whose
+            connections to close; the threads must have stopped (optional).
+    """
+    thread_ids = None if thread_ids is None else set(thread_ids)
+    with _lock:
+        keys = [
+            key for key in _connections
+            if database in (None, key[0]) and (thread_ids is None or key[1] in thread_ids)
+            ]
+        connections = [_connections.pop(key) for key in keys]
+
+    for conn in connections:
+        conn.close()
+
+
+def is_locked_error(error: sqlite3.OperationalError) -> bool:
+    """Return True if the error was caused by another connection's lock."""
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def retry_on_locked(func):
+    """
+    Decorator that retries a write transaction with exponential backoff
+    while the database is locked by another connection. The transaction
+    must be rolled back when it fails, which get_connection's context
+    manager does.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = config.DB_RETRY_DELAY
+        for attempt in range(config.DB_WRITE_RETRIES):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_locked_error(e) or attempt == config.DB_WRITE_RETRIES - 1:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    return wrapper
@@ -1,10 +1,35 @@
 """
 provides utility functions for clipboard operations.
+
+Text is copied through Tk's own clipboard once a Tk widget is registered
+with use_tk_clipboard, which takes no more than a Tcl call. Otherwise
+pyperclip is used, which may start a process (e.g. xclip) per copy.
 """
 
-import pyperclip
+clipboard_widget = None  # Tk widget whose clipboard is used, if any
+
+
+def use_tk_clipboard(widget):
+    """Copy through the clipboard of the given Tk widget from now on."""
+    global clipboard_widget
+    clipboard_widget = widget
 
 
 def copy(text):
     """Copies the given text to the clipboard."""
+    if clipboard_widget is not None:
+        clipboard_widget.clipboard_clear()
+        clipboard_widget.clipboard_append(text)
+        return
+
+    import pyperclip  # Only needed without Tk
     pyperclip.copy(text)
+
+
+def paste():
+    """Returns the text on the clipboard."""
+    if clipboard_widget is not None:
+        return clipboard_widget.clipboard_get()
+
+    import pyperclip  # Only needed without Tk
+    return pyperclip.paste()
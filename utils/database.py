@@ -1,9 +1,35 @@
 """Interacts with the database"""
 
-import sqlite3
-from typing import List, Tuple, Optional
+import json
+import re
+from typing import Dict, List, Tuple, Optional
+from utils.connection import get_connection, retry_on_locked
+from utils.instrumentation import instrumented
 
+# Separates tag names when they are concatenated in a query
+TAG_SEPARATOR = chr(31)
 
+
+def template_columns(alias: str = "", with_text: bool = True) -> str:
+    """
+    Returns the template columns selected by the template queries. List
+    views leave the text out, so that long texts are only read when they
+    are needed, see get_template_texts.
+
+    Args:
+        alias: The alias of the templates table, e.g. "t." (optional).
+        with_text: Include the template text (optional).
+
+    Returns:
+        The columns, separated by commas.
+    """
+    columns = ["template_id", "template_name", "template_text", "category_id", "created_at"]
+    if not with_text:
+        columns.remove("template_text")
+    return ", ".join(alias + column for column in columns)
+
+
+@instrumented
 def get_categories(database:Optional[str] = "data\\db.sqlite3") -> List[Tuple]:
     """
     Returns the name of all categories in the database.
@@ -14,7 +40,7 @@ def get_categories(database:Optional[str] = "data\\db.sqlite3") -> List[Tuple]:
     Returns:
         A list of tuples, each containing a category.
     """
-    with sqlite3.connect(database) as db:
+    with get_connection(database) as db:
         cursor = db.cursor()
         query = '''
             SELECT category_name
@@ -26,6 +52,30 @@ def get_categories(database:Optional[str] = "data\\db.sqlite3") -> List[Tuple]:
     return data
 
 
+@instrumented
+def get_category_ids(database:Optional[str] = "data\\db.sqlite3") -> Dict[str, int]:
+    """
+    Returns the ID of every category in the database.
+
+    Args:
+        database: The database to connect two (optional).
+
+    Returns:
+        A dictionary mapping each category name to its ID.
+    """
+    with get_connection(database) as db:
+        cursor = db.cursor()
+        query = '''
+            SELECT category_name, category_id
+            FROM category
+        '''
+        cursor.execute(query)
+        data = cursor.fetchall()
+
+    return dict(data)
+
+
+@instrumented
 def get_quick_copy_buttons(database:Optional[str] = "data\\db.sqlite3") -> List[Tuple]:
     """
     Returns the name and text of all quick copy buttons
@@ -37,7 +87,7 @@ def get_quick_copy_buttons(database:Optional[str] = "data\\db.sqlite3") -> List[
         A list of tuples, each containing the quick copy button
         names and texts.
     """
-    with sqlite3.connect(database) as db:
+    with get_connection(database) as db:
         cursor = db.cursor()
         query = '''
             SELECT button_icon, button_text
@@ -49,11 +99,14 @@ def get_quick_copy_buttons(database:Optional[str] = "data\\db.sqlite3") -> List[
     return data
 
 
+@instrumented
 def get_templates(
         category: Optional[str] = None,
         template_name: Optional[str] = None,
         tags: Optional[List[str]] = None,
-        database: str = "data\\db.sqlite3"
+        database: str = "data\\db.sqlite3",
+        with_tags: bool = False,
+        with_text: bool = True
     ) -> List[Tuple]:
     """
     Returns the name and text of all templates matching the specified
@@ -64,16 +117,29 @@ def get_templates(
         template_name: The name of the template to filter by (optional).
         tags: A list of tag names to filter templates by (optional).
         database: The database to connect to (optional).
+        with_tags: Add the list of tags of each template to its tuple (optional).
+        with_text: Include the template text, see template_columns (optional).
 
     Returns:
-        A list of tuples, each containing the template ID, name, text, category ID, and creation date.
+        A list of tuples, each containing the template ID, name, text, category ID, and creation date,
+        followed by the list of tags if with_tags is set. The text is left out if
+        with_text is False.
     """
-    with sqlite3.connect(database) as db:
+    with get_connection(database) as db:
         cursor = db.cursor()
 
+        # Every tag of the template, not only the tags matching the filter
+        tag_names = ''',
+            (
+                SELECT group_concat(tg2.tag_name, char(31))
+                FROM template_tags tt2
+                JOIN tags tg2 ON tt2.tag_id = tg2.tag_id
+                WHERE tt2.template_id = t.template_id
+            )''' if with_tags else ''
+
         # Base query
-        query = '''
-            SELECT t.template_id, t.template_name, t.template_text, t.category_id, t.created_at
+        query = f'''
+            SELECT {template_columns("t.", with_text)}{tag_names}
             FROM templates t
             LEFT JOIN category c ON t.category_id = c.category_id
             LEFT JOIN template_tags tt ON t.template_id = tt.template_id
@@ -105,9 +171,272 @@ def get_templates(
         cursor.execute(query, params)
         templates = cursor.fetchall()
 
+    if with_tags:
+        templates = [
+            template[:-1] + (template[-1].split(TAG_SEPARATOR) if template[-1] else [],)
+            for template in templates
+            ]
+
+    return templates
+
+
+@instrumented
+def get_templates_by_id(
+        template_ids: List[int],
+        database: str = "data\\db.sqlite3",
+        with_text: bool = True
+    ) -> List[Tuple]:
+    """
+    Returns the templates with the given IDs.
+
+    Args:
+        template_ids: The IDs of the templates to return.
+        database: The database to connect to (optional).
+        with_text: Include the template text, see template_columns (optional).
+
+    Returns:
+        A list of tuples, each containing the template ID, name, text, category ID, and creation date.
+        The text is left out if with_text is False.
+    """
+    if not template_ids:
+        return []
+
+    with get_connection(database) as db:
+        cursor = db.cursor()
+
+        placeholders = ', '.join('?' for _ in template_ids)
+        query = f'''
+            SELECT {template_columns(with_text=with_text)}
+            FROM templates
+            WHERE template_id IN ({placeholders})
+            ORDER BY template_id
+        '''
+        cursor.execute(query, list(template_ids))
+        templates = cursor.fetchall()
+
     return templates
 
 
+@instrumented
+def get_template_texts(
+        template_ids: List[int],
+        database: str = "data\\db.sqlite3"
+    ) -> Dict[int, str]:
+    """
+    Returns the texts of many templates using a single query, e.g. to
+    copy the templates checked in a list that was read without texts.
+
+    Args:
+        template_ids: The IDs of the templates to get the texts of.
+        database: The database to connect to (optional).
+
+    Returns:
+        A dictionary mapping each template ID to its text. IDs of
+        templates that do not exist are left out.
+    """
+    if not template_ids:
+        return {}
+
+    with get_connection(database) as db:
+        cursor = db.cursor()
+        cursor.execute('''
+            SELECT template_id, template_text
+            FROM templates
+            WHERE template_id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(list(template_ids)),))
+        texts = dict(cursor.fetchall())
+
+    return texts
+
+
+def fts_query(terms: List[str]) -> Tuple[str, List[str]]:
+    """
+    Builds a query selecting the templates matching the search terms, as
+    template_id and score columns. Every word in a term must match the
+    start of a word in the template name, text or tags. Templates matching
+    any of the terms are returned. Names and texts are indexed in
+    templates_fts and tag names in tags_fts, so that retagging a template
+    does not re-index its text; a word may match in either table.
+
+    The score adds up the bm25 ranks of the words in the names and tags,
+    lowest first; names are weighted so that name matches rank above tag
+    matches. Like in the in-memory store, text matches are not ranked, as
+    ranking them costs more than the rest of the query: templates matching
+    only in their text score 0.
+
+    Args:
+        terms: A list of search terms.
+
+    Returns:
+        The query and its parameters, or an empty string and no parameters
+        if there are no words.
+    """
+    words_by_term = [re.findall(r'[^\W_]+', term) for term in terms]
+    words_by_term = [words for words in words_by_term if words]
+    if not words_by_term:
+        return '', []
+
+    # A template matches a word if its name, text or tags do
+    word_match = '''
+        SELECT * FROM (
+            SELECT rowid AS template_id FROM templates_fts WHERE templates_fts MATCH ?
+            UNION
+            SELECT rowid FROM tags_fts WHERE tags_fts MATCH ?
+        )'''
+    matched = ' UNION '.join(
+        'SELECT * FROM (' + ' INTERSECT '.join([word_match] * len(words)) + ')'
+        for words in words_by_term
+        )
+    params = [
+        f'"{word}"*' for words in words_by_term for word in words for _ in range(2)
+        ]
+
+    any_word = ' OR '.join(
+        dict.fromkeys(f'"{word}"*' for words in words_by_term for word in words)
+        )
+    query = f'''
+        SELECT s.template_id, sum(s.score) AS score
+        FROM (
+            SELECT template_id, 0.0 AS score, 1 AS matched
+            FROM ({matched})
+            UNION ALL
+            SELECT rowid, bm25(templates_fts, 10.0, 0.0), 0
+            FROM templates_fts
+            WHERE templates_fts MATCH ?
+            UNION ALL
+            SELECT rowid, bm25(tags_fts), 0
+            FROM tags_fts
+            WHERE tags_fts MATCH ?
+        ) s
+        GROUP BY s.template_id
+        HAVING max(s.matched)
+    '''
+    return query, params + [f'template_name : ({any_word})', any_word]
+
+
+@instrumented
+def search_templates(
+        terms: List[str],
+        category: Optional[str] = None,
+        limit: Optional[int] = None,
+        database: str = "data\\db.sqlite3",
+        with_text: bool = True
+    ) -> List[Tuple]:
+    """
+    Returns the templates matching the search terms in their name, text
+    or tags, ranked with the best match first. Name matches rank above
+    tag matches, which rank above text matches.
+
+    Args:
+        terms: A list of search terms.
+        category: The name of the category to filter templates by (optional).
+        limit: The maximum number of templates to return (optional).
+        database: The database to connect to (optional).
+        with_text: Include the template text, see template_columns (optional).
+
+    Returns:
+        A list of tuples, each containing the template ID, name, text, category ID, and creation date.
+        The text is left out if with_text is False.
+    """
+    matches, params = fts_query(terms)
+    if not matches:
+        return []
+
+    with get_connection(database) as db:
+        cursor = db.cursor()
+
+        query = f'''
+            SELECT {template_columns("t.", with_text)}
+            FROM ({matches}) m
+            JOIN templates t ON t.template_id = m.template_id
+            LEFT JOIN category c ON t.category_id = c.category_id
+            WHERE 1=1
+        '''
+
+        # Add filtering by category if provided
+        if category:
+            query += ' AND c.category_name = ?'
+            params.append(category)
+
+        query += ' ORDER BY m.score, t.template_id'
+
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        cursor.execute(query, params)
+        templates = cursor.fetchall()
+
+    return templates
+
+
+@instrumented
+def get_template_groups(
+        terms: Optional[List[str]] = None,
+        database: str = "data\\db.sqlite3",
+        with_text: bool = True
+    ) -> Dict[str, List[Tuple]]:
+    """
+    Returns the templates matching the search terms grouped by category,
+    using a single query. Every category is included, even when no
+    templates in it match, so the number of matches per category is the
+    length of its list.
+
+    Args:
+        terms: A list of search terms, see search_templates (optional).
+        database: The database to connect to (optional).
+        with_text: Include the template text, see template_columns (optional).
+
+    Returns:
+        A dictionary mapping each category name to a list of tuples, each
+        containing the template ID, name, text, category ID, and creation
+        date. The text is left out if with_text is False. Templates are
+        ranked with the best match first.
+    """
+    match, params = fts_query(terms) if terms else ('', [])
+
+    # Templates matching the search terms, with their rank
+    if match:
+        matches = f'''
+            SELECT {template_columns("t.", with_text)}, f.score
+            FROM ({match}) f
+            JOIN templates t ON t.template_id = f.template_id
+        '''
+    elif terms:
+        matches = f'''
+            SELECT {template_columns(with_text=with_text)}, 0 AS score
+            FROM templates
+            WHERE 0
+        '''
+    else:
+        matches = f'''
+            SELECT {template_columns(with_text=with_text)}, 0 AS score
+            FROM templates
+        '''
+
+    with get_connection(database) as db:
+        cursor = db.cursor()
+
+        # Left join so that categories without matches are included
+        query = f'''
+            SELECT c.category_name, {template_columns("m.", with_text)}
+            FROM category c
+            LEFT JOIN ({matches}) m ON m.category_id = c.category_id
+            ORDER BY c.category_id, m.score, m.template_id
+        '''
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+    groups = {}
+    for row in rows:
+        templates = groups.setdefault(row[0], [])
+        if row[1] is not None:
+            templates.append(row[1:])
+
+    return groups
+
+
+@instrumented
 def get_tags(template_id:int, database:Optional[str] = "data\\db.sqlite3") -> List[str]:
     """
     Returns all the tags associated with a given template ID.
@@ -119,42 +448,175 @@ def get_tags(template_id:int, database:Optional[str] = "data\\db.sqlite3") -> Li
     Returns:
         A list of tags.
     """
-    with sqlite3.connect(database) as db:
+    tags = get_tags_for_templates([template_id], database).get(template_id)
+
+    # If there are no tags associated, return an empty tag.
+    return tags or [""]
+
+
+@instrumented
+def get_tags_for_templates(
+        template_ids: Optional[List[int]] = None,
+        database: Optional[str] = "data\\db.sqlite3"
+    ) -> Dict[int, List[str]]:
+    """
+    Returns the tags of many templates using a single query.
+
+    Args:
+        template_ids: The IDs of the templates to get tags for. All
+            templates are included if not provided (optional).
+        database: The database to connect to (optional).
+
+    Returns:
+        A dictionary mapping each template ID to its list of tags.
+        Templates without tags are left out.
+    """
+    with get_connection(database) as db:
         cursor = db.cursor()
 
-        # Get all tag IDs associated with the given template ID.
+        query = '''
+            SELECT tt.template_id, tg.tag_name
+            FROM template_tags tt
+            JOIN tags tg ON tt.tag_id = tg.tag_id
+        '''
+        params = []
+
+        # Add filtering by template IDs if provided
+        if template_ids is not None:
+            query += ' WHERE tt.template_id IN (SELECT value FROM json_each(?))'
+            params.append(json.dumps(list(template_ids)))
+
+        query += ' ORDER BY tt.template_id, tg.tag_id'
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+    tags = {}
+    for template_id, tag_name in rows:
+        tags.setdefault(template_id, []).append(tag_name)
+
+    return tags
+
+
+@instrumented
+def write_template_tags(
+        cursor,
+        template_tags: Dict[int, List[str]],
+        replace: bool = False
+    ) -> None:
+    """
+    Associates tags with templates using a constant number of statements,
+    however many templates and tags there are. Missing tags are created
+    and the full-text index of tag names, tags_fts, is refreshed. The
+    caller is responsible for committing the transaction.
+
+    Args:
+        cursor: A cursor of the connection to write with.
+        template_tags: A dictionary mapping template IDs to tag names.
+        replace: Remove the existing tags of the templates first (optional).
+
+    Returns:
+        None.
+    """
+    template_ids = json.dumps(list(template_tags))
+    pairs = json.dumps([
+        [template_id, tag]
+        for template_id, tags in template_tags.items()
+        for tag in dict.fromkeys(tags)  # Drop duplicates, keep order
+        ])
+
+    # Remove the existing tags of every template
+    if replace:
         cursor.execute('''
-            SELECT tag_id
-            FROM template_tags
-            WHERE template_id=?
-        ''', (template_id,))
+            DELETE FROM template_tags
+            WHERE template_id IN (SELECT value FROM json_each(?))
+        ''', (template_ids,))
+
+    # Create any tags that do not exist yet
+    cursor.execute('''
+        INSERT OR IGNORE INTO tags (tag_name)
+        SELECT DISTINCT json_extract(value, '$[1]') FROM json_each(?)
+    ''', (pairs,))
+
+    # Associate the tags with the templates
+    cursor.execute('''
+        INSERT OR IGNORE INTO template_tags (template_id, tag_id)
+        SELECT json_extract(p.value, '$[0]'), tg.tag_id
+        FROM json_each(?) p
+        JOIN tags tg ON tg.tag_name = json_extract(p.value, '$[1]')
+    ''', (pairs,))
+
+    # Re-index the tag names of the templates, which are kept apart from
+    # their names and texts so that those are not re-indexed too
+    cursor.execute('''
+        DELETE FROM tags_fts
+        WHERE rowid IN (SELECT value FROM json_each(?))
+    ''', (template_ids,))
+    cursor.execute('''
+        INSERT INTO tags_fts (rowid, tag_names)
+        SELECT tt.template_id, group_concat(tg.tag_name, ' ')
+        FROM template_tags tt
+        JOIN tags tg ON tt.tag_id = tg.tag_id
+        WHERE tt.template_id IN (SELECT value FROM json_each(?))
+        GROUP BY tt.template_id
+    ''', (template_ids,))
+
+
+@instrumented
+@retry_on_locked
+def tag_templates(
+        template_ids: List[int],
+        tags: List[str],
+        database: Optional[str] = "data\\db.sqlite3"
+    ) -> None:
+    """
+    Adds tags to many templates in one transaction. Existing tags of the
+    templates are kept.
 
-        tag_ids = cursor.fetchall()
+    Args:
+        template_ids: The IDs of the templates to tag.
+        tags: A list of tags to associate with every template.
+        database: The database to connect to (optional).
 
-        # If there are no tags associated, return an empty list.
-        if not tag_ids:
-            return [""]
+    Returns:
+        None.
+    """
+    tags = [tag.capitalize() for tag in tags]
 
-        # Extract tag IDs from the fetched results
-        tag_ids = [tag[0] for tag in tag_ids]
+    with get_connection(database) as db:
+        cursor = db.cursor()
+        write_template_tags(cursor, {template_id: tags for template_id in template_ids})
+        db.commit()
 
-        # Prepare a placeholder string for the SQL query
-        placeholders = ', '.join('?' for _ in tag_ids)
 
-        # Execute the query to fetch tag names for the associated tag IDs
-        query = f'''
-            SELECT tag_name
-            FROM tags
-            WHERE tag_id IN ({placeholders})
-        '''
-        
-        # Fetch the results
-        cursor.execute(query, tag_ids)
-        tags = cursor.fetchall()
+@instrumented
+@retry_on_locked
+def retag_templates(
+        template_tags: Dict[int, List[str]],
+        database: Optional[str] = "data\\db.sqlite3"
+    ) -> None:
+    """
+    Replaces the tags of many templates in one transaction.
+
+    Args:
+        template_tags: A dictionary mapping template IDs to their new tags.
+        database: The database to connect to (optional).
 
-    return [tag[0] for tag in tags]
+    Returns:
+        None.
+    """
+    template_tags = {
+        template_id: [tag.capitalize() for tag in tags]
+        for template_id, tags in template_tags.items()
+        }
+
+    with get_connection(database) as db:
+        cursor = db.cursor()
+        write_template_tags(cursor, template_tags, replace=True)
+        db.commit()
 
 
+@instrumented
+@retry_on_locked
 def update_template(
         template_id:int,
         new_category:Optional[str] = None,
@@ -183,7 +645,7 @@ def update_template(
     new_tags = [tag.capitalize() for tag in new_tags] if new_tags else []
     new_template_text = new_template_text.strip()
 
-    with sqlite3.connect(database) as db:
+    with get_connection(database) as db:
         cursor = db.cursor()
 
         # Update template name if provided
@@ -213,39 +675,8 @@ def update_template(
 
         # Update tags if provided
         if new_tags:
-            # Delete existing tags associated with the template
-            cursor.execute('''
-                DELETE FROM template_tags
-                WHERE template_id = ?
-            ''', (template_id,))
-
-            # Insert new tags
-            for tag_name in new_tags:
-                # Check if the tag exists
-                cursor.execute('''
-                    SELECT tag_id
-                    FROM tags
-                    WHERE tag_name = ?
-                ''', (tag_name,))
-                tag = cursor.fetchone()
-
-                if tag:  # If the tag exists, insert the association
-                    cursor.execute('''
-                        INSERT INTO template_tags (template_id, tag_id)
-                        VALUES (?, ?)
-                    ''', (template_id, tag[0]))
-                else:  # If the tag does not exist, create it
-                    cursor.execute('''
-                        INSERT INTO tags (tag_name)
-                        VALUES (?)
-                    ''', (tag_name,))
-                    new_tag_id = cursor.lastrowid  # Get the ID of the newly created tag
-
-                    # Associate the new tag with the template
-                    cursor.execute('''
-                        INSERT INTO template_tags (template_id, tag_id)
-                        VALUES (?, ?)
-                    ''', (template_id, new_tag_id))
+            # Replace the tags associated with the template
+            write_template_tags(cursor, {template_id: new_tags}, replace=True)
 
         # Update template text if provided
         if new_template_text is not None:
@@ -259,13 +690,15 @@ def update_template(
         db.commit()
 
 
+@instrumented
+@retry_on_locked
 def create_template(
         name: str,
         template_text: str,
         category: Optional[str] = None,
         tags: Optional[List[str]] = None,
         database: Optional[str] = "data\\db.sqlite3"
-    ) -> None:
+    ) -> int:
     """
     Creates a template with the provided information.
 
@@ -277,7 +710,7 @@ def create_template(
         database: The database to connect to (optional).
 
     Returns:
-        None.
+        The ID of the new template.
     """
 
     # Format entries
@@ -287,7 +720,7 @@ def create_template(
     tags = [tag.capitalize() for tag in tags] if tags else []
 
     # Connect to the database
-    with sqlite3.connect(database) as db:
+    with get_connection(database) as db:
         cursor = db.cursor()
 
         # Get category_id or set to 0 if the category does not exist
@@ -314,29 +747,16 @@ def create_template(
 
         # Add tags
         if tags:
-            for tag in tags:
-                # Insert the tag if it does not exist
-                cursor.execute('''
-                    INSERT OR IGNORE INTO tags (tag_name)
-                    VALUES (?)
-                ''', (tag,))
-                
-                # Retrieve the tag_id of the inserted or existing tag
-                cursor.execute('''
-                    SELECT tag_id FROM tags WHERE tag_name = ?
-                ''', (tag,))
-                tag_id = cursor.fetchone()[0]
-
-                # Associate the tag with the template
-                cursor.execute('''
-                    INSERT INTO template_tags (template_id, tag_id)
-                    VALUES (?, ?)
-                ''', (template_id, tag_id))
+            write_template_tags(cursor, {template_id: tags})
 
         # Commit the transaction
         db.commit()
 
+    return template_id
+
 
+@instrumented
+@retry_on_locked
 def delete_template(template_id: int, database: Optional[str] = "data\\db.sqlite3") -> None:
     """
     Deletes a template with the given template_id from the database.
@@ -348,7 +768,7 @@ def delete_template(template_id: int, database: Optional[str] = "data\\db.sqlite
     Returns:
         None.
     """
-    with sqlite3.connect(database) as db:
+    with get_connection(database) as db:
         cursor = db.cursor()
 
         # Delete associated entries in the template_tags table
@@ -0,0 +1,196 @@
+"""
+Typo-tolerant search over template names and tags using a trigram index
+of their words, and prefix search over template texts using a word index.
+"""
+
+import bisect
+import functools
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, List, Set
+from data import config
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words, like the full-text index does."""
+    return re.findall(r'[^\W_]+', text.lower())
+
+
+@functools.lru_cache(maxsize=65536)
+def word_trigrams(word: str) -> FrozenSet[str]:
+    """
+    Return the trigrams of a word. The word is padded so that its first
+    and last letters weigh as much as the middle ones.
+    """
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class FuzzyIndex():
+    """
+    Matches search words against the words of item names and tags despite
+    typos. Trigrams map to the distinct words containing them, so a search
+    compares the query with the vocabulary rather than with every item,
+    then maps the similar words to items. Name and tag words are scored in
+    one pass; tag matches count config.FUZZY_TAG_WEIGHT of name matches.
+    Items are not stored, so removing one takes the name and tags it was
+    added with.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self.names = {}  # word -> IDs of the items with it in their name
+        self.tags = {}  # word -> IDs of the items with it in their tags
+        self.trigrams = {}  # trigram -> words containing it
+
+    def add_word(self, postings: Dict[str, Set[int]], word: str, item_id: int) -> None:
+        """Add an item to the postings of a word, indexing new words."""
+        if word not in self.names and word not in self.tags:
+            for trigram in word_trigrams(word):
+                self.trigrams.setdefault(trigram, set()).add(word)
+        postings.setdefault(word, set()).add(item_id)
+
+    def remove_word(self, postings: Dict[str, Set[int]], word: str, item_id: int) -> None:
+        """Remove an item from the postings of a word, dropping unused words."""
+        posting = postings.get(word)
+        if posting is None:
+            return
+        posting.discard(item_id)
+        if posting:
+            return
+        del postings[word]
+        if word not in self.names and word not in self.tags:
+            for trigram in word_trigrams(word):
+                self.trigrams[trigram].discard(word)
+                if not self.trigrams[trigram]:
+                    del self.trigrams[trigram]
+
+    def add(self, item_id: int, name: str, tags: List[str]) -> None:
+        """Add an item to the index."""
+        for word in set(tokenize(name)):
+            self.add_word(self.names, word, item_id)
+        for word in set(tokenize(" ".join(tags))):
+            self.add_word(self.tags, word, item_id)
+
+    def remove(self, item_id: int, name: str, tags: List[str]) -> None:
+        """Remove an item added with the given name and tags."""
+        for word in set(tokenize(name)):
+            self.remove_word(self.names, word, item_id)
+        for word in set(tokenize(" ".join(tags))):
+            self.remove_word(self.tags, word, item_id)
+
+    def similar_words(self, word: str, threshold: float) -> Dict[str, float]:
+        """
+        Return the indexed words similar to a word, mapped to a similarity
+        between 0 and 1. Similarity is mostly the share of the word's
+        trigrams found in the other word, so prefixes of a word match it
+        well; the share of the other word's trigrams breaks ties in favour
+        of words of the same length.
+        """
+        query = word_trigrams(word)
+        shared = Counter()
+        for trigram in query:
+            shared.update(self.trigrams.get(trigram, ()))
+
+        similar = {}
+        for other, count in shared.items():
+            score = 0.9 * count / len(query) + 0.1 * count / len(word_trigrams(other))
+            if score >= threshold:
+                similar[other] = score
+
+        return similar
+
+    def search(self, query: str, threshold: float = config.FUZZY_THRESHOLD) -> Dict[int, float]:
+        """
+        Return the items matching every word of the query, mapped to their
+        score between 0 and 1: the mean similarity of each query word to
+        the best matching word in the item's name or tags.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        scores = None
+        for word in words:
+            matches = []
+            for other, similarity in self.similar_words(word, threshold).items():
+                if other in self.names:
+                    matches.append((similarity, self.names[other]))
+                if other in self.tags:
+                    matches.append((similarity * config.FUZZY_TAG_WEIGHT, self.tags[other]))
+
+            # Update from the worst match to the best so that every item
+            # keeps the score of its best matching word
+            matches.sort(key=lambda match: match[0])
+            best = {}
+            for similarity, item_ids in matches:
+                best.update(dict.fromkeys(item_ids, similarity))
+
+            if scores is None:
+                scores = best
+            else:
+                scores = {
+                    item_id: scores[item_id] + best[item_id]
+                    for item_id in scores.keys() & best.keys()
+                    }
+            if not scores:
+                return {}
+
+        if len(words) > 1:
+            scores = {item_id: score / len(words) for item_id, score in scores.items()}
+        return scores or {}
+
+
+class WordIndex():
+    """
+    Maps words to the items whose text contains them, for prefix search.
+    Like FuzzyIndex, removing an item takes the text it was added with.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self.postings = {}  # word -> set of item IDs
+        self.vocabulary = []  # Every word, for finding words by prefix
+        self.vocabulary_sorted = True
+
+    def add(self, item_id: int, text: str) -> None:
+        """
+        Add an item to the index. New words are appended to the vocabulary,
+        which is sorted once on the next search rather than on every word.
+        """
+        for word in set(tokenize(text)):
+            if word in self.postings:
+                self.postings[word].add(item_id)
+            else:
+                self.postings[word] = {item_id}
+                self.vocabulary.append(word)
+                self.vocabulary_sorted = False
+
+    def remove(self, item_id: int, text: str) -> None:
+        """
+        Remove an item added with the given text. Words without items are
+        left in the vocabulary, as removing them from the sorted list would
+        cost more than skipping them.
+        """
+        for word in set(tokenize(text)):
+            if word in self.postings:
+                self.postings[word].discard(item_id)
+
+    def sort_vocabulary(self) -> None:
+        """Sort the words added since the last sort, e.g. after a bulk load."""
+        if not self.vocabulary_sorted:
+            self.vocabulary.sort()
+            self.vocabulary_sorted = True
+
+    def search(self, query: str) -> Set[int]:
+        """Return the items with a word starting with each word of the query."""
+        self.sort_vocabulary()
+        result = None
+        for prefix in tokenize(query):
+            start = bisect.bisect_left(self.vocabulary, prefix)
+            end = bisect.bisect_left(self.vocabulary, prefix + "￿", start)
+            matches = set().union(*(
+                self.postings[word] for word in self.vocabulary[start:end]
+                ))
+            result = matches if result is None else result & matches
+            if not result:
+                break
+
+        return result or set()
@@ -0,0 +1,132 @@
+"""
+Records call counts, latency histograms and row counts for instrumented
+functions. Recording is off unless config.INSTRUMENTATION is True or it
+is switched on at runtime (e.g. from the debug window); while off, an
+instrumented call only costs one attribute check.
+"""
+
+import bisect
+import functools
+import json
+import threading
+import time
+from typing import Dict
+from data import config
+
+# Upper bounds of the latency histogram buckets in milliseconds
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Instrumentation():
+    """Holds the statistics of every instrumented function."""
+
+    def __init__(self, enabled: bool = config.INSTRUMENTATION):
+        """Create empty statistics."""
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stats = {}  # name -> statistics of one function
+
+    def record(self, name: str, elapsed_ms: float, rows) -> None:
+        """Add a call to the statistics of a function."""
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "histogram": [0] * (len(BUCKETS_MS) + 1),
+                    }
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["histogram"][bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+            if rows is None:
+                stats["errors"] += 1
+            else:
+                stats["rows"] += rows
+
+    def percentile(self, histogram: list, fraction: float) -> float:
+        """
+        Return the upper bound of the bucket holding the given fraction
+        of calls, in milliseconds (infinity for the last bucket).
+        """
+        target = fraction * sum(histogram)
+        count = 0
+        for bound, calls in zip(BUCKETS_MS + (float("inf"),), histogram):
+            count += calls
+            if calls and count >= target:
+                return bound
+        return 0.0
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return a copy of the statistics with means and percentiles added."""
+        with self.lock:
+            stats = {name: dict(values, histogram=list(values["histogram"]))
+                     for name, values in self.stats.items()}
+
+        labels = [f"<={bound}ms" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        for values in stats.values():
+            values["mean_ms"] = values["total_ms"] / values["calls"]
+            values["p50_ms"] = self.percentile(values["histogram"], 0.5)
+            values["p95_ms"] = self.percentile(values["histogram"], 0.95)
+            values["histogram"] = dict(zip(labels, values["histogram"]))
+        return stats
+
+    def reset(self) -> None:
+        """Forget every recorded call."""
+        with self.lock:
+            self.stats.clear()
+
+    def export_json(self, path: str) -> None:
+        """Write the statistics to a JSON file."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"enabled": self.enabled, "functions": self.snapshot()}, file, indent=2)
+
+
+def count_rows(result):
+    """
+    Return the number of rows in a result, or 1 for other results. For a
+    dict of row lists, e.g. templates grouped by category, the rows in
+    the lists are counted.
+    """
+    if isinstance(result, dict) and all(
+            isinstance(value, (list, tuple, set)) for value in result.values()):
+        return sum(len(value) for value in result.values())
+    try:
+        return len(result)
+    except TypeError:
+        return 0 if result is None else 1
+
+
+def instrumented(func=None, name=None):
+    """
+    Decorator that records the calls of a function in the shared
+    instrumentation. The function's module and qualified name are used
+    unless a name is given.
+    """
+    if func is None:
+        return functools.partial(instrumented, name=name)
+    name = name or f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not instrumentation.enabled:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+        rows = None
+        try:
+            result = func(*args, **kwargs)
+            rows = count_rows(result)
+            return result
+        finally:
+            instrumentation.record(name, (time.perf_counter() - start) * 1000, rows)
+
+    return wrapper
+
+
+# Shared instrumentation used by the decorator
+instrumentation = Instrumentation()
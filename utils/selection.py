@@ -0,0 +1,61 @@
+"""
+Keeps track of the templates the user has checked, by template ID, so
+that the selection does not depend on which row widgets exist.
+
+The texts of checked templates are kept too once read, so that copying
+them does not wait for the database.
+"""
+
+from typing import Dict, Iterable, Iterator, List
+
+
+class Selection():
+    """Checked template IDs, in the order they were checked."""
+
+    def __init__(self):
+        """Create an empty selection."""
+        self.ids = {}  # Used as an ordered set
+        self.texts = {}  # template_id -> text, for checked templates only
+
+    def set(self, template_id: int, checked: bool) -> None:
+        """Check or uncheck a template."""
+        if checked:
+            self.ids[template_id] = None
+        else:
+            self.ids.pop(template_id, None)
+            self.texts.pop(template_id, None)
+
+    def discard(self, template_ids: Iterable[int]) -> None:
+        """Uncheck the given templates, e.g. after they were deleted."""
+        for template_id in template_ids:
+            self.ids.pop(template_id, None)
+            self.texts.pop(template_id, None)
+
+    def clear(self) -> None:
+        """Uncheck every template."""
+        self.ids.clear()
+        self.texts.clear()
+
+    def add_texts(self, texts: Dict[int, str]) -> None:
+        """Keep the texts of templates, keyed by ID, that are still checked."""
+        for template_id, text in texts.items():
+            if template_id in self.ids:
+                self.texts[template_id] = text
+
+    def forget_texts(self, template_ids: Iterable[int]) -> None:
+        """Drop kept texts, e.g. after the templates were updated."""
+        for template_id in template_ids:
+            self.texts.pop(template_id, None)
+
+    def missing_texts(self) -> List[int]:
+        """Return the checked templates whose texts are not kept yet."""
+        return [template_id for template_id in self.ids if template_id not in self.texts]
+
+    def __contains__(self, template_id: int) -> bool:
+        return template_id in self.ids
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self.ids))
+
+    def __len__(self) -> int:
+        return len(self.ids)
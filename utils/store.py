@@ -0,0 +1,502 @@
+"""
+In-memory copy of the template library. Reads are answered from memory
+after the library is loaded once; writes go to the database and then
+update the copy. The store may be used from several threads.
+
+Template texts are not kept in memory: templates are held as (ID, name,
+category ID, creation date) tuples, texts are indexed for search while
+loading and read from the database when they are needed, see get_texts.
+"""
+
+import contextlib
+import functools
+import sys
+import threading
+from typing import Dict, List, Tuple, Optional
+from data import config
+from utils import database as db
+from utils.instrumentation import instrumented
+from utils.fuzzy import FuzzyIndex, WordIndex
+from utils.tag_index import TagIndex, from_bitset
+
+
+def deep_sizeof(obj, seen=None) -> int:
+    """Return the approximate size of an object and its contents in bytes."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(
+            deep_sizeof(key, seen) + deep_sizeof(value, seen)
+            for key, value in obj.items()
+            )
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, name), seen) for name in obj.__slots__)
+
+    return size
+
+
+# Attributes holding the cached library, replaced together by load
+LIBRARY = ("categories", "category_ids", "quick_copy_buttons",
+           "templates", "tags", "fuzzy", "words", "tag_index")
+
+
+def synchronized(method):
+    """Decorator that holds the store's lock while the method runs."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def loaded_first(method):
+    """
+    Decorator that loads the library, if needed, before the method runs.
+    Place it above synchronized: the store's lock must not be held while
+    waiting for a load, as the load takes it to swap the library in.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.ensure_loaded()
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class TemplateStore():
+    """
+    Caches categories, templates, tags and quick copy buttons so that
+    the UI never has to read from the database after warm-up.
+    """
+
+    def __init__(self, database: str = "data\\db.sqlite3"):
+        """Create an empty store. The library is loaded on first use."""
+        self.database = database
+        self.lock = threading.RLock()
+        self.load_lock = threading.RLock()  # Held while a load builds the library
+        self.loaded = False
+        self.writes = 0  # Writes finished through the store
+        self.running_writes = 0  # Writes started but not finished
+        self.categories = []
+        self.category_ids = {}
+        self.quick_copy_buttons = []
+        self.templates = {}  # template_id -> template tuple, without the text
+        self.tags = {}  # template_id -> list of tag names
+        self.fuzzy = FuzzyIndex()  # Fuzzy search over names and tags
+        self.words = WordIndex()  # Prefix search over texts
+        self.tag_index = TagIndex()  # Filtering by tags and category
+        self.listeners = []
+
+    @instrumented
+    def load(self) -> None:
+        """
+        Read the whole library from the database. It is built in a separate
+        store without holding this store's lock, so other threads keep
+        reading the previous copy, and then swapped in. The library is read
+        again if a write went through the store while it was being built.
+        """
+        with self.load_lock:
+            while True:
+                writes = self.writes
+                library = TemplateStore(self.database)
+                library.categories = db.get_categories(self.database)
+                library.category_ids = db.get_category_ids(self.database)
+                library.quick_copy_buttons = db.get_quick_copy_buttons(self.database)
+                library.cache_templates(
+                    db.get_templates(database=self.database, with_text=False),
+                    db.get_tags_for_templates(database=self.database)
+                    )
+                library.index_texts(list(library.templates))
+
+                with self.lock:
+                    if self.writes == writes and not self.running_writes:
+                        for name in LIBRARY:
+                            setattr(self, name, getattr(library, name))
+                        self.loaded = True
+                        return
+
+    def ensure_loaded(self) -> None:
+        """Load the library if it has not been loaded yet."""
+        if not self.loaded:
+            with self.load_lock:
+                if not self.loaded:
+                    self.load()
+
+    @contextlib.contextmanager
+    def write_through(self):
+        """
+        Context for a write to the database, yielding True if the store is
+        loaded and must be updated too. A load finishing meanwhile would
+        miss the write, so it reads the library again instead.
+        """
+        with self.lock:
+            self.running_writes += 1
+            loaded = self.loaded
+        try:
+            yield loaded
+        finally:
+            with self.lock:
+                self.running_writes -= 1
+                self.writes += 1
+
+    def cache_templates(
+            self,
+            templates: List[Tuple],
+            template_tags: Optional[Dict[int, List[str]]] = None
+        ) -> None:
+        """
+        Add or replace templates and their tags in the store. The templates
+        are tuples without the text; see index_texts for searching texts.
+        The tags are read from the database if not provided, before the
+        store's lock is taken, so that readers never wait on the disk.
+        """
+        if template_tags is None:
+            template_tags = db.get_tags_for_templates(
+                [template[0] for template in templates], self.database
+                )
+
+        with self.lock:
+            for template in templates:
+                template_id = template[0]
+                tags = [tag for tag in template_tags.get(template_id, []) if tag]
+                self.unindex_template(template_id)
+                self.templates[template_id] = template
+                self.tags[template_id] = tags
+                self.fuzzy.add(template_id, template[1], tags)
+                self.tag_index.add(template_id, template[2], tags)
+
+    def unindex_template(self, template_id: int) -> None:
+        """
+        Remove a template's name, category and tags from the search
+        indexes, if it is in the store.
+        """
+        template = self.templates.get(template_id)
+        if template is not None:
+            tags = self.tags[template_id]
+            self.fuzzy.remove(template_id, template[1], tags)
+            self.tag_index.remove(template_id, template[2], tags)
+
+    def index_texts(self, template_ids: List[int]) -> None:
+        """
+        Read the texts of templates from the database and add them to the
+        text search index, config.TEXT_INDEX_BATCH_SIZE texts at a time.
+        The store's lock is only held while a batch is added.
+        """
+        batch_size = config.TEXT_INDEX_BATCH_SIZE
+        for start in range(0, len(template_ids), batch_size):
+            texts = db.get_template_texts(template_ids[start:start + batch_size], self.database)
+            with self.lock:
+                for template_id, text in texts.items():
+                    self.words.add(template_id, text)
+        with self.lock:
+            self.words.sort_vocabulary()
+
+    @synchronized
+    def unindex_texts(self, texts: Dict[int, str]) -> None:
+        """Remove texts, keyed by template ID, from the text search index."""
+        for template_id, text in texts.items():
+            self.words.remove(template_id, text)
+
+    @synchronized
+    def forget_template(self, template_id: int) -> None:
+        """Remove a template from the store."""
+        self.unindex_template(template_id)
+        self.templates.pop(template_id, None)
+        self.tags.pop(template_id, None)
+
+    def add_listener(self, listener) -> None:
+        """
+        Call listener(created, updated, deleted) with lists of template IDs
+        after every write. Listeners run on the thread that wrote.
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        """Stop calling a listener added with add_listener."""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(
+            self,
+            created: Optional[List[int]] = None,
+            updated: Optional[List[int]] = None,
+            deleted: Optional[List[int]] = None
+        ) -> None:
+        """Tell the listeners which templates changed."""
+        for listener in list(self.listeners):
+            listener(list(created or []), list(updated or []), list(deleted or []))
+
+    @loaded_first
+    @synchronized
+    def get_categories(self) -> List[Tuple]:
+        """See database.get_categories."""
+        return list(self.categories)
+
+    @loaded_first
+    @synchronized
+    def get_category_names(self) -> Dict[int, str]:
+        """Return the category names keyed by category ID."""
+        return {category_id: name for name, category_id in self.category_ids.items()}
+
+    @loaded_first
+    @synchronized
+    def get_quick_copy_buttons(self) -> List[Tuple]:
+        """See database.get_quick_copy_buttons."""
+        return list(self.quick_copy_buttons)
+
+    @loaded_first
+    @synchronized
+    def get_tags(self, template_id: int) -> List[str]:
+        """See database.get_tags."""
+        return list(self.tags.get(template_id) or [""])
+
+    @loaded_first
+    @synchronized
+    def get_tags_for_templates(
+            self,
+            template_ids: Optional[List[int]] = None
+        ) -> Dict[int, List[str]]:
+        """See database.get_tags_for_templates."""
+        if template_ids is None:
+            template_ids = self.tags.keys()
+        return {
+            template_id: list(self.tags[template_id])
+            for template_id in template_ids if self.tags.get(template_id)
+            }
+
+    @loaded_first
+    @synchronized
+    def get_templates(
+            self,
+            category: Optional[str] = None,
+            template_name: Optional[str] = None,
+            tags: Optional[List[str]] = None,
+            with_tags: bool = False
+        ) -> List[Tuple]:
+        """See database.get_templates, with with_text=False."""
+        category_id = self.category_ids.get(category, -1) if category else None
+        template_name = template_name.lower() if template_name else None
+
+        # Like the database, match tags only when no name is given
+        any_of = None
+        if tags and not template_name:
+            any_of = [
+                name for tag in tags for name in self.tag_index.matching_tags(tag)
+                ]
+            if not any_of:
+                return []
+
+        templates = []
+        bits = self.tag_index.query(any_of=any_of, category_id=category_id)
+        for template_id in from_bitset(bits):
+            template = self.templates[template_id]
+            if template_name and template_name not in template[1].lower():
+                continue
+            if with_tags:
+                template += (list(self.tags[template_id]),)
+            templates.append(template)
+
+        return templates
+
+    def get_texts(self, template_ids: List[int]) -> Dict[int, str]:
+        """
+        Return the texts of templates keyed by ID, read from the database
+        in one query. IDs of templates that do not exist are left out.
+        """
+        return db.get_template_texts(list(template_ids), self.database)
+
+    @loaded_first
+    @synchronized
+    def get_templates_by_id(self, template_ids: List[int]) -> Dict[int, Tuple]:
+        """
+        Return the templates with the given IDs, keyed by ID. IDs of
+        templates that do not exist are left out.
+        """
+        return {
+            template_id: self.templates[template_id]
+            for template_id in template_ids if template_id in self.templates
+            }
+
+    @instrumented
+    @loaded_first
+    @synchronized
+    def filter_templates(
+            self,
+            all_tags: Optional[List[str]] = None,
+            any_tags: Optional[List[str]] = None,
+            no_tags: Optional[List[str]] = None,
+            category: Optional[str] = None
+        ) -> List[Tuple]:
+        """
+        Return the templates with every tag in all_tags, at least one tag
+        in any_tags and no tag in no_tags, in the category if given, in
+        template ID order. Tags are matched whole, ignoring case.
+        """
+        category_id = self.category_ids.get(category, -1) if category else None
+        bits = self.tag_index.query(all_tags, any_tags, no_tags, category_id)
+        return [self.templates[template_id] for template_id in from_bitset(bits)]
+
+    def match_scores(self, term: str) -> Dict[int, float]:
+        """
+        Return the templates matching a search term, mapped to a score
+        between 0 and 1. Names and tags are matched in one fuzzy pass, so
+        typos still find them; texts only match words starting with every
+        word of the term, and score config.TEXT_MATCH_SCORE.
+        """
+        scores = dict.fromkeys(self.words.search(term), config.TEXT_MATCH_SCORE)
+        for template_id, score in self.fuzzy.search(term).items():
+            if score > scores.get(template_id, 0):
+                scores[template_id] = score
+
+        return scores
+
+    @instrumented
+    @loaded_first
+    @synchronized
+    def search_templates(
+            self,
+            terms: List[str],
+            category: Optional[str] = None,
+            limit: Optional[int] = None
+        ) -> List[Tuple]:
+        """
+        Return the templates matching any of the search terms, best match
+        first. Unlike database.search_templates, names and tags are matched
+        with typo tolerance, so "perfromance" finds "Performance".
+        """
+        category_id = self.category_ids.get(category) if category else None
+
+        scores = {}
+        for term in terms:
+            for template_id, score in self.match_scores(term).items():
+                if score > scores.get(template_id, 0):
+                    scores[template_id] = score
+
+        # Sorting by ID first keeps ties in ID order, as the sort is stable
+        ranked = sorted(sorted(scores), key=scores.get, reverse=True)
+        templates = [
+            self.templates[template_id] for template_id in ranked
+            if not category or self.templates[template_id][2] == category_id
+            ]
+        return templates[:limit] if limit else templates
+
+    @instrumented
+    @loaded_first
+    @synchronized
+    def get_template_groups(
+            self,
+            terms: Optional[List[str]] = None
+        ) -> Dict[str, List[Tuple]]:
+        """See database.get_template_groups, with with_text=False."""
+        if terms:
+            templates = self.search_templates(terms)
+        else:
+            templates = self.templates.values()
+
+        category_names = self.get_category_names()
+        groups = {category[0]: [] for category in self.categories}
+        for template in templates:
+            name = category_names.get(template[2])
+            if name in groups:
+                groups[name].append(template)
+
+        return groups
+
+    def create_template(
+            self,
+            name: str,
+            template_text: str,
+            category: Optional[str] = None,
+            tags: Optional[List[str]] = None
+        ) -> int:
+        """Create a template in the database and add it to the store."""
+        with self.write_through() as loaded:
+            template_id = db.create_template(
+                name, template_text, category, tags, self.database
+                )
+            if loaded:
+                self.cache_templates(
+                    db.get_templates_by_id([template_id], self.database, with_text=False)
+                    )
+                self.index_texts([template_id])
+        self.notify(created=[template_id])
+        return template_id
+
+    def update_template(
+            self,
+            template_id: int,
+            new_category: Optional[str] = None,
+            new_name: Optional[str] = None,
+            new_tags: Optional[List[str]] = None,
+            new_template_text: Optional[str] = None
+        ) -> None:
+        """Update a template in the database and in the store."""
+        with self.write_through() as loaded:
+            # The old text is needed to remove it from the text search index
+            old_texts = {}
+            if loaded and new_template_text is not None:
+                old_texts = db.get_template_texts([template_id], self.database)
+
+            db.update_template(
+                template_id, new_category, new_name, new_tags,
+                new_template_text, self.database
+                )
+            if loaded:
+                self.cache_templates(
+                    db.get_templates_by_id([template_id], self.database, with_text=False)
+                    )
+                if old_texts:
+                    self.unindex_texts(old_texts)
+                    self.index_texts([template_id])
+        self.notify(updated=[template_id])
+
+    def tag_templates(self, template_ids: List[int], tags: List[str]) -> None:
+        """Add tags to many templates in the database and in the store."""
+        with self.write_through() as loaded:
+            db.tag_templates(template_ids, tags, self.database)
+            if loaded:
+                self.cache_templates(
+                    db.get_templates_by_id(template_ids, self.database, with_text=False)
+                    )
+        self.notify(updated=template_ids)
+
+    def retag_templates(self, template_tags: Dict[int, List[str]]) -> None:
+        """Replace the tags of many templates in the database and in the store."""
+        with self.write_through() as loaded:
+            db.retag_templates(template_tags, self.database)
+            if loaded:
+                self.cache_templates(
+                    db.get_templates_by_id(list(template_tags), self.database, with_text=False)
+                    )
+        self.notify(updated=list(template_tags))
+
+    def delete_template(self, template_id: int) -> None:
+        """Delete a template from the database and from the store."""
+        with self.write_through() as loaded:
+            # The text is needed to remove it from the text search index
+            old_texts = db.get_template_texts([template_id], self.database) if loaded else {}
+            db.delete_template(template_id, self.database)
+            self.forget_template(template_id)
+            self.unindex_texts(old_texts)
+        self.notify(deleted=[template_id])
+
+    @synchronized
+    def memory_usage(self) -> Dict[str, int]:
+        """Return the approximate memory used by each part of the store in bytes."""
+        seen = set()
+        usage = {name: deep_sizeof(getattr(self, name), seen) for name in LIBRARY}
+        usage["total"] = sum(usage.values())
+        return usage
+
+
+# Shared store used by the UI
+template_store = TemplateStore()
@@ -0,0 +1,132 @@
+"""
+Posting lists of template IDs per tag and per category, for filtering
+templates by AND, OR and NOT across tags with integer bitset operations.
+"""
+
+from typing import Iterable, List, Optional
+
+
+def to_bitset(ids: Iterable[int]) -> int:
+    """Return an integer with the bit of each ID set."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for item_id in ids:
+        buffer[item_id >> 3] |= 1 << (item_id & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def from_bitset(bitset: int) -> List[int]:
+    """Return the IDs whose bits are set in an integer, in ascending order."""
+    bits = bin(bitset)[:1:-1]
+    ids = []
+    position = bits.find("1")
+    while position != -1:
+        ids.append(position)
+        position = bits.find("1", position + 1)
+    return ids
+
+
+class Posting():
+    """
+    A set of IDs that builds its bitset on first use and then keeps it up
+    to date, so that rarely queried postings cost no more than a set.
+    """
+
+    __slots__ = ("ids", "bitset")
+
+    def __init__(self):
+        """Create an empty posting."""
+        self.ids = set()
+        self.bitset = None
+
+    def add(self, item_id: int) -> None:
+        """Add an ID to the posting."""
+        self.ids.add(item_id)
+        if self.bitset is not None:
+            self.bitset |= 1 << item_id
+
+    def discard(self, item_id: int) -> None:
+        """Remove an ID from the posting if it is there."""
+        self.ids.discard(item_id)
+        if self.bitset is not None:
+            self.bitset &= ~(1 << item_id)
+
+    def bits(self) -> int:
+        """Return the posting as a bitset."""
+        if self.bitset is None:
+            self.bitset = to_bitset(self.ids)
+        return self.bitset
+
+
+class TagIndex():
+    """
+    Maps lowercase tag names and category IDs to the templates using them.
+    Items are not stored, so removing one takes the category and tags it
+    was added with.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self.everything = Posting()
+        self.categories = {}  # category ID -> Posting
+        self.tags = {}  # lowercase tag name -> Posting
+
+    def add(self, item_id: int, category_id: int, tags: List[str]) -> None:
+        """Add an item to the index."""
+        self.everything.add(item_id)
+        self.categories.setdefault(category_id, Posting()).add(item_id)
+        for tag in tags:
+            self.tags.setdefault(tag.lower(), Posting()).add(item_id)
+
+    def remove(self, item_id: int, category_id: int, tags: List[str]) -> None:
+        """Remove an item added with the given category and tags."""
+        self.everything.discard(item_id)
+        for postings, key in [(self.categories, category_id)] + [
+                (self.tags, tag.lower()) for tag in tags]:
+            posting = postings.get(key)
+            if posting is not None:
+                posting.discard(item_id)
+                if not posting.ids:
+                    del postings[key]
+
+    def tag_bits(self, tag: str) -> int:
+        """Return the bitset of the items with a tag."""
+        posting = self.tags.get(tag.lower())
+        return posting.bits() if posting else 0
+
+    def matching_tags(self, substring: str) -> List[str]:
+        """Return the indexed tags containing a substring."""
+        substring = substring.lower()
+        return [tag for tag in self.tags if substring in tag]
+
+    def query(
+            self,
+            all_of: Optional[List[str]] = None,
+            any_of: Optional[List[str]] = None,
+            none_of: Optional[List[str]] = None,
+            category_id: Optional[int] = None
+        ) -> int:
+        """
+        Return the bitset of the items with every tag in all_of, at least
+        one tag in any_of and no tag in none_of, in the category if given.
+        Empty or missing arguments do not filter.
+        """
+        if category_id is not None:
+            posting = self.categories.get(category_id)
+            bits = posting.bits() if posting else 0
+        else:
+            bits = self.everything.bits()
+
+        for tag in all_of or []:
+            bits &= self.tag_bits(tag)
+        if any_of:
+            union = 0
+            for tag in any_of:
+                union |= self.tag_bits(tag)
+            bits &= union
+        for tag in none_of or []:
+            bits &= ~self.tag_bits(tag)
+
+        return bits
@@ -0,0 +1,214 @@
+"""
+Streams templates between the database and JSONL or CSV files.
+
+Every record has a name, text, category and tags. In JSONL files the
+tags are a list (or a comma separated string); in CSV files they are a
+comma separated string.
+"""
+
+import csv
+import json
+import os
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, Optional
+from data import config
+from utils.connection import get_connection, retry_on_locked
+from utils.database import TAG_SEPARATOR, get_category_ids, write_template_tags
+
+FIELDS = ["name", "text", "category", "tags"]
+DEFAULT_CATEGORY = "Unassigned"  # Category of records without one
+
+
+def get_format(path: str, fmt: Optional[str] = None) -> str:
+    """Return the file format, guessed from the extension if not given."""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"Unsupported format '{fmt}', use jsonl or csv.")
+    return fmt
+
+
+def split_tags(tags) -> list:
+    """Return tags given as a list or a comma separated string as a list."""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return [tag.strip() for tag in tags or [] if tag.strip()]
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """Yield the records of a JSONL or CSV file one at a time."""
+    fmt = get_format(path, fmt)
+    with open(path, newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+@retry_on_locked
+def write_batch(records: list, category_ids: Dict[str, int], database: str) -> None:
+    """
+    Insert a batch of records in one transaction. Records are formatted
+    like database.create_template formats its arguments. Categories that
+    do not exist yet are created and added to category_ids; records
+    without a category are put in DEFAULT_CATEGORY.
+    """
+    categories = [
+        (record.get("category") or "").strip().capitalize() or DEFAULT_CATEGORY
+        for record in records
+        ]
+
+    with get_connection(database) as db:
+        cursor = db.cursor()
+
+        # Hold the write lock so that the new template IDs can be assigned
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT COALESCE(MAX(template_id), 0) FROM templates")
+        first_id = cursor.fetchone()[0] + 1
+
+        # Create the missing categories, so that every template is shown in a tab
+        new_category_ids = {}
+        missing = sorted(set(categories) - set(category_ids))
+        if missing:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO category (category_name) VALUES (?)",
+                [(category,) for category in missing]
+                )
+            cursor.execute('''
+                SELECT category_name, category_id
+                FROM category
+                WHERE category_name IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(missing),))
+            new_category_ids = dict(cursor.fetchall())
+
+        templates = []
+        template_tags = {}
+        for template_id, record, category in zip(
+                range(first_id, first_id + len(records)), records, categories):
+            templates.append((
+                template_id,
+                str(record["name"]).strip().capitalize(),
+                str(record.get("text") or "").strip(),
+                category_ids.get(category) or new_category_ids[category],
+                ))
+            tags = [tag.capitalize() for tag in split_tags(record.get("tags"))]
+            if tags:
+                template_tags[template_id] = tags
+
+        # Index the batch in one statement instead of one trigger per row
+        cursor.execute("INSERT INTO templates_fts_deferred VALUES (1)")
+        cursor.executemany('''
+            INSERT INTO templates (template_id, template_name, template_text, category_id)
+            VALUES (?, ?, ?, ?)
+        ''', templates)
+        if template_tags:
+            write_template_tags(cursor, template_tags)
+        cursor.execute('''
+            INSERT INTO templates_fts (rowid, template_name, template_text)
+            SELECT template_id, template_name, template_text
+            FROM templates
+            WHERE template_id >= ?
+        ''', (first_id,))
+        cursor.execute("DELETE FROM templates_fts_deferred")
+
+        db.commit()
+
+    # Only once committed, as a retried batch must create them again
+    category_ids.update(new_category_ids)
+
+
+def import_templates(
+        path: str,
+        fmt: Optional[str] = None,
+        batch_size: int = config.IMPORT_BATCH_SIZE,
+        progress: Optional[Callable[[int], None]] = None,
+        database: str = "data\\db.sqlite3"
+    ) -> int:
+    """
+    Imports templates from a JSONL or CSV file without loading the whole
+    file into memory. Templates are written in batched transactions.
+    Categories that do not exist yet are created.
+
+    Args:
+        path: The file to import.
+        fmt: The file format, jsonl or csv (optional, guessed from the extension).
+        batch_size: The number of templates per transaction (optional).
+        progress: A function called with the number of templates imported
+            so far after every batch (optional).
+        database: The database to connect to (optional).
+
+    Returns:
+        The number of templates imported.
+    """
+    category_ids = get_category_ids(database)
+    records = read_records(path, fmt)
+    count = 0
+    while batch := list(islice(records, batch_size)):
+        write_batch(batch, category_ids, database)
+        count += len(batch)
+        if progress:
+            progress(count)
+
+    return count
+
+
+def iter_export_records(database: str) -> Iterator[Dict]:
+    """Yield every template as a record, streaming from the database."""
+    cursor = get_connection(database).execute('''
+        SELECT t.template_name, t.template_text, c.category_name,
+               (
+                   SELECT group_concat(tg.tag_name, char(31))
+                   FROM template_tags tt
+                   JOIN tags tg ON tt.tag_id = tg.tag_id
+                   WHERE tt.template_id = t.template_id
+               )
+        FROM templates t
+        LEFT JOIN category c ON t.category_id = c.category_id
+        ORDER BY t.template_id
+    ''')
+    for name, text, category, tags in cursor:
+        yield {
+            "name": name,
+            "text": text,
+            "category": category or "",
+            "tags": tags.split(TAG_SEPARATOR) if tags else [],
+            }
+
+
+def write_records(records: Iterable[Dict], path: str, fmt: Optional[str] = None) -> int:
+    """Write records to a JSONL or CSV file and return how many were written."""
+    fmt = get_format(path, fmt)
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            writer = csv.DictWriter(file, fieldnames=FIELDS)
+            writer.writeheader()
+        for record in records:
+            if fmt == "csv":
+                writer.writerow({**record, "tags": ", ".join(record["tags"])})
+            else:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+
+    return count
+
+
+def export_templates(
+        path: str,
+        fmt: Optional[str] = None,
+        database: str = "data\\db.sqlite3"
+    ) -> int:
+    """
+    Exports every template to a JSONL or CSV file, streaming rows from
+    the database.
+
+    Args:
+        path: The file to write.
+        fmt: The file format, jsonl or csv (optional, guessed from the extension).
+        database: The database to connect to (optional).
+
+    Returns:
+        The number of templates exported.
+    """
+    return write_records(iter_export_records(database), path, fmt)
@@ -1,7 +1,6 @@
 import tkinter as tk
 from tkinter import ttk
-# from data import config
-from utils import database
+from data import config
 
 
 def on_mouse_wheel(event, canvas):
@@ -13,11 +12,8 @@ def on_mouse_wheel(event, canvas):
 
 def bind_scroll_events(widget, canvas):
     """
-    Bind mouse wheel events to given widget for scrolling.
-
-    NOTE: This function exists due to a bounding box issue in the
-    configure_scroll_region function and should be sorted out at a
-    later date.
+    Bind mouse wheel events to given widget for scrolling. The rows of
+    a virtual list cover its canvas, so they need the bindings too.
     """
     widget.bind("<MouseWheel>", lambda e: on_mouse_wheel(e, canvas))  # Windows and macOS
     widget.bind("<Button-4>", lambda e: canvas.yview_scroll(-1, "units"))  # Linux scroll up
@@ -45,64 +41,124 @@ def highlight_row(widgets):
             )
 
 
-def add_widgets(widget_layout, instance, canvas, scrollable_frame,
-                category=None, name=None, tags=None):
+class VirtualList():
     """
-    Add widgets to scrollable frame.
-
-    widget_layout: A function with the following parameters:
-        canvas, scrollable_frame, template, row_index
+    Scrollable list that only creates widgets for the rows visible in
+    the canvas viewport (plus a small overscan) and reuses them as the
+    user scrolls.
+
+    create_row: A function with the parameter virtual_list that returns
+        an empty row widget whose parent is virtual_list.canvas.
+    bind_row: A function with the following parameters:
+        virtual_list, row, item, row_index
     """
-    templates = database.get_templates(category, name, tags)
-    for i, template in enumerate(templates):
-        widget_layout(canvas, instance, scrollable_frame, template, i)
-
-
-def configure_scroll_region(canvas, scrollable_frame):
-    """Configure scroll region of canvas based on scrollable frame."""
-    # Get the bounding box of the scrollable_frame
-    bbox = scrollable_frame.bbox()
-    if bbox:  # Check if bbox is valid
-        canvas.configure(scrollregion=bbox)
-
-        # Adjust the scrollregion if the content height is less than the
-        # canvas height
-        canvas_height = canvas.winfo_height()
-        if bbox[3] <= canvas_height:  # bbox[3] is the bottom y coordinate
-            canvas.configure(scrollregion=(0, 0, 0, canvas_height))
-
-
-def resize_canvas(event, canvas, window_id):
-    """Resize the window_id to match the canvas width."""
-    canvas_width = event.width
-    canvas.itemconfig(window_id, width=canvas_width)
-
-
-def add_scrollable_frame(frame):
-    """Create a scrollable canvas with a frame inside for content."""
-    canvas = tk.Canvas(frame, highlightthickness=0)
-    canvas.grid(row=0, column=0, sticky="nsew")
-
-    scrollbar = ttk.Scrollbar(frame, orient="vertical", command=canvas.yview)
-    scrollbar.grid(row=0, column=1, sticky="ns")
-    canvas.configure(yscrollcommand=scrollbar.set)
-
-    scrollable_frame = ttk.Frame(canvas)
-    window_id = canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-
-    scrollable_frame.bind(
-        "<Configure>",
-        lambda _event: configure_scroll_region(canvas, scrollable_frame)
-        )
-    canvas.bind(
-        "<Configure>",
-        lambda event: resize_canvas(event, canvas, window_id)
-        )
-
-    frame.grid_rowconfigure(0, weight=1)
-    frame.grid_columnconfigure(0, weight=1)
-
-    bind_scroll_events(scrollable_frame, canvas)
-
-    return canvas, scrollable_frame
 
+    def __init__(self, frame, create_row, bind_row,
+                 overscan=config.OVERSCAN_ROWS):
+        """Create the canvas and scrollbar in the given frame."""
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.overscan = overscan
+        self.items = []
+        self.rows = []  # Pool of (row, window_id) pairs
+        self.row_height = 0
+        self.width = 1
+
+        self.canvas = tk.Canvas(frame, highlightthickness=0)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+
+        self.scrollbar = ttk.Scrollbar(
+            frame, orient="vertical", command=self.canvas.yview
+            )
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.canvas.configure(yscrollcommand=self.on_scroll)
+        self.canvas.bind("<Configure>", self.on_resize)
+
+        frame.grid_rowconfigure(0, weight=1)
+        frame.grid_columnconfigure(0, weight=1)
+
+        bind_scroll_events(self.canvas, self.canvas)
+
+    def add_row(self):
+        """Create a row widget and add it to the pool."""
+        row = self.create_row(self)
+        row.item = None
+        row.row_index = None
+        window_id = self.canvas.create_window(
+            (0, 0), window=row, anchor="nw", width=self.width, state="hidden"
+            )
+        bind_scroll_events(row, self.canvas)
+        for widget in row.winfo_children():
+            bind_scroll_events(widget, self.canvas)
+        self.rows.append((row, window_id))
+
+        # Use the first row to measure the height of every row
+        if not self.row_height:
+            row.update_idletasks()
+            self.row_height = max(row.winfo_reqheight(), 1)
+            self.canvas.configure(yscrollincrement=self.row_height)
+
+    def set_items(self, items, keep_position=False):
+        """
+        Replace the items shown by the list and scroll to the top, or
+        keep the current scroll position if keep_position is True.
+        """
+        items = list(items)
+        if items == self.items:
+            return
+        self.items = items
+        if not self.rows:
+            self.add_row()
+        self.update_scroll_region()
+        if not keep_position:
+            self.canvas.yview_moveto(0)
+        self.refresh()
+
+    def update_scroll_region(self):
+        """Size the scroll region to fit every item."""
+        height = max(len(self.items) * self.row_height,
+                     self.canvas.winfo_height())
+        self.canvas.configure(scrollregion=(0, 0, 0, height))
+
+    def refresh(self):
+        """Bind the rows in the pool to the items in the viewport."""
+        if not self.rows:
+            return
+        first = int(self.canvas.canvasy(0) // self.row_height) - self.overscan
+        first = max(first, 0)
+        count = (self.canvas.winfo_height() // self.row_height
+                 + 1 + 2 * self.overscan)
+        while len(self.rows) < count:
+            self.add_row()
+
+        for offset, (row, window_id) in enumerate(self.rows):
+            index = first + offset
+            if index >= len(self.items):
+                self.canvas.itemconfigure(window_id, state="hidden")
+                continue
+            item = self.items[index]
+            if row.item is not item or row.row_index != index:
+                self.bind_row(self, row, item, index)
+                row.item = item
+                row.row_index = index
+            self.canvas.coords(window_id, 0, index * self.row_height)
+            self.canvas.itemconfigure(window_id, state="normal")
+
+    def redraw(self):
+        """Rebind every visible row, e.g. after the selection changes."""
+        for row, _ in self.rows:
+            row.item = None
+        self.refresh()
+
+    def on_scroll(self, first, last):
+        """Update the scrollbar and the rows when the view moves."""
+        self.scrollbar.set(first, last)
+        self.refresh()
+
+    def on_resize(self, event):
+        """Match the rows to the canvas width and fill the new height."""
+        self.width = event.width
+        for _, window_id in self.rows:
+            self.canvas.itemconfigure(window_id, width=self.width)
+        self.update_scroll_region()
+        self.refresh()
@@ -0,0 +1,120 @@
+"""
+Runs database calls on a background thread so that they never block the
+Tk main loop.
+"""
+
+import itertools
+import queue
+import threading
+from data import config
+
+
+class QueryWorker():
+    """
+    Executes functions on a worker thread, one at a time and in the order
+    they were submitted. Results are handed back to Tk through a queue
+    that is polled with after(), so callbacks always run on the main
+    thread.
+    """
+
+    def __init__(self, root, poll_ms=config.WORKER_POLL_MS):
+        """Start the worker thread and begin polling for results."""
+        self.root = root
+        self.poll_ms = poll_ms
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.ids = itertools.count(1)
+        self.latest = {}  # key -> ID of the most recent request with that key
+        self.submitted = 0  # Requests submitted, counted on the main thread
+        self.finished = 0  # Requests whose result was handled or dropped
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.poll_job = root.after(poll_ms, self.poll)
+
+    def submit(self, func, *args, callback=None, error_callback=None, key=None):
+        """
+        Queue a call to func(*args).
+
+        callback: A function called on the main thread with the result.
+        error_callback: A function called on the main thread with the
+            exception if the call fails. Tk's error report is used if not
+            provided.
+        key: Requests sharing a key supersede each other. An older request
+            is skipped if it has not started yet, and its result is dropped
+            if it has.
+        """
+        request_id = next(self.ids)
+        self.submitted += 1
+        if key is not None:
+            self.latest[key] = request_id
+        self.requests.put((request_id, key, func, args, callback, error_callback))
+        return request_id
+
+    def call_soon(self, func, *args):
+        """
+        Queue a call to func(*args) on the main thread. Unlike Tk's own
+        methods, this may be called from any thread.
+        """
+        self.results.put((None, None, args, None, lambda args: func(*args), None))
+
+    def is_current(self, request_id, key):
+        """Return True if the request has not been superseded."""
+        return key is None or self.latest.get(key) == request_id
+
+    def is_idle(self):
+        """
+        Return True once every submitted request has run, or been skipped,
+        and its callback has been called. Call from the main thread.
+        """
+        return self.finished == self.submitted
+
+    def run(self):
+        """Execute queued requests until stopped."""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            request_id, key, func, args, callback, error_callback = request
+            if not self.is_current(request_id, key):
+                # Still reported, so that the main thread counts it as finished
+                self.results.put((request_id, key, None, None, None, None))
+                continue
+
+            try:
+                result, error = func(*args), None
+            except Exception as e:  # Handed to the main thread
+                result, error = None, e
+            self.results.put((request_id, key, result, error, callback, error_callback))
+
+    def poll(self):
+        """Run the callbacks of finished requests on the main thread."""
+        try:
+            while True:
+                try:
+                    request_id, key, result, error, callback, error_callback = (
+                        self.results.get_nowait()
+                        )
+                except queue.Empty:
+                    break
+                if request_id is not None:  # Not a call_soon call
+                    self.finished += 1
+                if not self.is_current(request_id, key):
+                    continue
+
+                if error is None:
+                    if callback:
+                        callback(result)
+                elif error_callback:
+                    error_callback(error)
+                else:
+                    self.root.report_callback_exception(
+                        type(error), error, error.__traceback__
+                        )
+        finally:
+            self.poll_job = self.root.after(self.poll_ms, self.poll)
+
+    def stop(self):
+        """Stop the worker thread after the queued requests have run."""
+        self.requests.put(None)
+        self.thread.join(timeout=5)